@@ -10,7 +10,7 @@ from functools import partial
 from typing import Optional
 import binascii
 import logging
-from rpy2040.rpy2040 import Rp2040, loadbin
+from rpy2040.rpy2040 import Rp2040, FLASH_START, loadbin
 from util.uf2 import loaduf2
 
 LOGGING_LEVEL = logging.ERROR
@@ -160,9 +160,12 @@ def main():
 
     filename = str(args.filename)
     if filename.endswith('.bin'):
-        loadbin(filename, rp.flash)
+        image_size = loadbin(filename, rp.flash)
     elif filename.endswith('.uf2'):
-        loaduf2(filename, rp.flash, offset=0x10000000)
+        image_size = loaduf2(filename, rp.flash, offset=FLASH_START)
+    else:
+        image_size = 0
+    rp.predecode(FLASH_START, image_size)
 
     if args.bootrom:
         loadbin(args.bootrom, rp.rom)
@@ -172,7 +175,7 @@ def main():
         rp.pc = args.entry_point
 
     if args.serial:
-        rp.mpu.regions['uart0'].init_serial(serial_port=args.serial)
+        rp.uart0.init_serial(serial_port=args.serial)
 
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         s.bind((HOST, PORT))
@@ -1,17 +1,73 @@
 '''
 Memory block implementation of the RPy2040 project
 '''
+import struct
+import sys
+from typing import Callable, Optional
+
+# Little-endian unsigned accessors, indexed by access width in bytes
+STRUCTS = {
+    1: struct.Struct('<B'),
+    2: struct.Struct('<H'),
+    4: struct.Struct('<I'),
+}
+MASKS = {
+    1: 0xff,
+    2: 0xffff,
+    4: 0xffffffff,
+}
+
+
+class LittleEndianWords:
+    '''
+    Word indexed view of a bytearray for big-endian hosts, where a native memoryview cast would swap the bytes.
+    '''
+
+    __slots__ = ('memory',)
+
+    def __init__(self, memory: bytearray):
+        self.memory = memory
+
+    def __getitem__(self, index: int) -> int:
+        return STRUCTS[4].unpack_from(self.memory, index << 2)[0]
+
+    def __setitem__(self, index: int, value: int) -> None:
+        STRUCTS[4].pack_into(self.memory, index << 2, value)
+
+
+def word_view(memory: bytearray) -> memoryview | LittleEndianWords:
+    # The memoryview keeps an export on the bytearray, so it can no longer be resized
+    if sys.byteorder == 'little':
+        return memoryview(memory)[:len(memory) & ~3].cast('I')
+    return LittleEndianWords(memory)
 
 
 class ByteArrayMemory:
 
+    __slots__ = ('base_address', 'size', 'memory', 'words', 'on_write')
+
     def __init__(self, base_address: int, size: int, preinit: int = 0x00):
         self.base_address = base_address
         self.size = size
-        self.memory = bytearray(size * [preinit])
+        self.memory = bytearray([preinit]) * size if preinit else bytearray(size)
+        # Aligned 32-bit accesses index this view directly, word n is at byte offset n * 4
+        self.words = word_view(self.memory)
+        self.on_write: Optional[Callable[[], None]] = None
 
     def write(self, address: int, value: int, num_bytes: int = 4) -> None:
-        self.memory[address:address+num_bytes] = value.to_bytes(num_bytes, byteorder='little')
+        if num_bytes == 4 and not address & 3:
+            self.words[address >> 2] = value & 0xffffffff
+        elif num_bytes in STRUCTS:
+            STRUCTS[num_bytes].pack_into(self.memory, address, value & MASKS[num_bytes])
+        else:
+            # Other widths only come from the debugger, e.g. GDB memory writes
+            self.memory[address:address+num_bytes] = value.to_bytes(num_bytes, byteorder='little')
+        if self.on_write is not None:
+            self.on_write()
 
     def read(self, address: int, num_bytes: int = 4) -> int:
+        if num_bytes == 4 and not address & 3:
+            return self.words[address >> 2]
+        if num_bytes in STRUCTS:
+            return STRUCTS[num_bytes].unpack_from(self.memory, address)[0]
         return int.from_bytes(self.memory[address:address+num_bytes], 'little')
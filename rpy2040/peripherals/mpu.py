@@ -2,12 +2,17 @@
 MPU implementation of the RPy2040 project
 '''
 import logging
+from bisect import bisect_right
 from typing import Protocol, Optional, Callable
 
 ATOMIC_XOR = 1
 ATOMIC_SET = 2
 ATOMIC_CLEAR = 3
 
+# Granularity of the MPU page table
+PAGE_SHIFT = 12
+PAGE_SIZE = 1 << PAGE_SHIFT
+
 logger = logging.getLogger("rpy2040")
 
 
@@ -33,8 +38,13 @@ def generate_mask(region: MemoryRegion) -> Optional[int]:
         return None
 
 
+def top_address_bytes(region: MemoryRegion) -> range:
+    return range(region.base_address >> 24, ((region.base_address + region.size - 1) >> 24) + 1)
+
+
 ReadHookType = Callable[[], int]
 WriteHookType = Callable[[int], None]
+RegionEntry = tuple[int, int, MemoryRegion]
 
 
 class MemoryRegionMap:
@@ -51,6 +61,18 @@ class MemoryRegionMap:
         # Narrow write: Align address
         address &= 0xfffffffc
 
+        if self.atomic_writes:
+            atomic_type = (address >> 12) & 3
+            address &= ~(3 << 12)
+
+        writehook = self.writehooks.get(address)
+        if writehook is None:
+            # Unhandled registers ignore writes, so skip the value replication and atomic read-modify-write
+            logger.info(">> Write of value [%d/%#x] to %s address [%#010x]",
+                        value, value, self.name, address + self.base_address)
+            # raise MemoryError
+            return
+
         # Narrow write: Replicate value if num_bytes is 1 or 2 bytes
         if num_bytes == 1:
             value = (value & 0xff) << 24 | (value & 0xff) << 16 | (value & 0xff) << 8 | value & 0xff
@@ -58,8 +80,6 @@ class MemoryRegionMap:
             value = (value & 0xffff) << 16 | value & 0xffff
 
         if self.atomic_writes:
-            atomic_type = (address >> 12) & 3
-            address &= ~(3 << 12)
             if atomic_type == ATOMIC_XOR:
                 value ^= self.read(address, num_bytes)
             elif atomic_type == ATOMIC_SET:
@@ -67,40 +87,66 @@ class MemoryRegionMap:
             elif atomic_type == ATOMIC_CLEAR:
                 value = self.read(address, num_bytes) & ~value
 
-        if address in self.writehooks:
-            self.writehooks[address](value)
-        else:
-            logger.info(f">> Write of value [{value}/{value:#x}] to {self.name} address [{address + self.base_address:#010x}]")  # noqa: E501
-            # raise MemoryError
+        writehook(value)
 
     def read(self, address: int, num_bytes: int = 4) -> int:
         # Align address
         aligned_address = address & 0xfffffffc
-        if aligned_address in self.readhooks:
-            result = self.readhooks[aligned_address]()
-            offset = address - aligned_address
-            return int.from_bytes(result.to_bytes(4, 'little')[offset:offset+num_bytes], 'little')
-        else:
-            logger.info(f"<< Read {num_bytes} bytes from {self.name} address [{address + self.base_address:#010x}]")
+        readhook = self.readhooks.get(aligned_address)
+        if readhook is None:
+            # Unhandled registers always read as zero
+            logger.info("<< Read %d bytes from %s address [%#010x]", num_bytes, self.name, address + self.base_address)
             return 0
             # raise MemoryError
+        result = readhook()
+        if num_bytes == 4 and address == aligned_address:
+            return result
+        offset = address - aligned_address
+        return int.from_bytes(result.to_bytes(4, 'little')[offset:offset+num_bytes], 'little')
 
 
 class Mpu:
 
+    __slots__ = ('regions', 'masks', 'page_table', 'region_table')
+
     def __init__(self):
         self.regions = {}
         self.masks = {}
+        # Region for every page that lies completely inside one region
+        self.page_table: dict[int, MemoryRegion] = {}
+        # Regions overlapping each top address byte, as their start addresses and (start, end, region) entries
+        # sorted on start address
+        self.region_table: list[tuple[tuple[int, ...], tuple[RegionEntry, ...]]] = 256 * [((), ())]
 
     def register_region(self, name: str, region: MemoryRegion) -> None:
+        replaced = self.regions.get(name)
+        tops = set(top_address_bytes(region))
+        if replaced is not None:
+            self.page_table = {page: r for page, r in self.page_table.items() if r is not replaced}
+            tops.update(top_address_bytes(replaced))
         self.regions[name] = region
         self.masks[name] = generate_mask(region)
+        first_page = (region.base_address + PAGE_SIZE - 1) >> PAGE_SHIFT
+        last_page = (region.base_address + region.size) >> PAGE_SHIFT
+        self.page_table.update(dict.fromkeys(range(first_page, last_page), region))
+        # Only the top address bytes of the new and the replaced region change
+        for top in tops:
+            entries = sorted(((r.base_address, r.base_address + r.size, r) for r in self.regions.values()
+                              if top in top_address_bytes(r)), key=lambda entry: entry[0])
+            self.region_table[top] = (tuple(entry[0] for entry in entries), tuple(entries))
 
     def find_region(self, address: int) -> Optional[MemoryRegion]:
-        for _, region in self.regions.items():
-            if (address >= region.base_address) and (address < (region.base_address + region.size)):
+        region = self.page_table.get(address >> PAGE_SHIFT)
+        if region is not None:
+            return region
+        # Small peripheral blocks only partially fill their page, binary search them on their start address
+        starts, entries = self.region_table[(address >> 24) & 0xff]
+        i = bisect_right(starts, address) - 1
+        if i >= 0:
+            _, end, region = entries[i]
+            if address < end:
                 return region
-        logger.warning(f"MMU: No matching region found for address {address:#010x}!!!")
+        logger.warning("MMU: No matching region found for address %#010x!!!", address)
         return None
 
     def write(self, address: int, value: int, num_bytes: int = 4) -> None:
@@ -117,6 +163,12 @@ class Mpu:
     def write_uint32(self, address: int, value: int) -> None:
         self.write(address, value, 4)
 
+    def write_uint16(self, address: int, value: int) -> None:
+        self.write(address, value, 2)
+
+    def write_uint8(self, address: int, value: int) -> None:
+        self.write(address, value, 1)
+
     def read_uint32(self, address: int) -> int:
         return self.read(address, 4)
 
@@ -2,6 +2,7 @@
 SIO implementation of the RPy2040 project
 '''
 from functools import partial
+from typing import Iterator
 from .mpu import MemoryRegionMap, ReadHookType, WriteHookType
 
 # SIO
@@ -21,8 +22,12 @@ SIO_SPINLOCK_BASE = 0x100
 SIO_SPINLOCK11 = 0x12c
 
 
-def get_pinlist(mask: int) -> list[int]:
-    return [i for i in range(32) if mask & (1 << i)]
+def get_pinlist(mask: int) -> Iterator[int]:
+    # Only visit the set bits, a GPIO write usually touches a single pin
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
 
 
 class Sio(MemoryRegionMap):
@@ -53,12 +58,10 @@ class Sio(MemoryRegionMap):
             self.readhooks[SIO_SPINLOCK_BASE + (spinlock_nr * 4)] = self.read_spinlock(spinlock_nr)
 
     def write_gpio_set(self, value: int) -> None:
-        pinlist = get_pinlist(value)
-        print(f">> GPIO pins set to HIGH/set: {pinlist}")
+        print(f">> GPIO pins set to HIGH/set: {list(get_pinlist(value))}")
 
     def write_gpio_clr(self, value: int) -> None:
-        pinlist = get_pinlist(value)
-        print(f">> GPIO pins set to LOW/cleared: {pinlist}")
+        print(f">> GPIO pins set to LOW/cleared: {list(get_pinlist(value))}")
 
     def read_cpuid(self) -> int:
         return self.cpuid
@@ -3,10 +3,10 @@ RP2040 emulator written in Python
 
 Inspired by the rp2040js emulator by Uri Shaked (https://github.com/wokwi/rp2040js)
 '''
-import array
 import ctypes
 import logging
-from typing import Iterable, Callable
+import struct
+from typing import Any, Iterable, Callable
 from .peripherals.mpu import Mpu
 from .peripherals.memory import ByteArrayMemory
 from .peripherals.uart import Uart
@@ -19,53 +19,113 @@ from .peripherals.clocks import Clocks
 from .peripherals.pll import Pll, PLL_USB_BASE
 from .peripherals.timer import Timer
 
-DEBUG_REGISTERS = True
-DEBUG_INSTRUCTIONS = True
+# Per-instruction tracing, these checks are removed entirely when running with python -O
+DEBUG_REGISTERS = False
+DEBUG_INSTRUCTIONS = False
 
 ROM_START = 0x00000000
 ROM_SIZE = 16 * 1024  # 16kB
 FLASH_START = 0x10000000
 FLASH_SIZE = 16 * 1024 * 1024  # 16MB
+FLASH_END = FLASH_START + FLASH_SIZE
 SRAM_START = 0x20000000
 SRAM_SIZE = 264 * 1024  # 264kB
+SRAM_END = SRAM_START + SRAM_SIZE
 
 # Default values for SP and PC
 SP_START = 0x20041000
 PC_START = 0x10000000
 
+# Number of instructions execute() runs per call to run()
+EXECUTE_BATCH_SIZE = 1024
+
 logger = logging.getLogger("rpy2040")
 
+unpack_uint16_pair = struct.Struct('<HH').unpack_from
+unpack_uint32 = struct.Struct('<I').unpack_from
+pack_uint32 = struct.Struct('<I').pack_into
+# Packing little-endian and unpacking big-endian reverses the bytes of a word, for REV
+pack_uint32_le = struct.Struct('<I').pack
+unpack_uint32_be = struct.Struct('>I').unpack
+# Packs and unpacks N consecutive 32-bit words, for block transfers of up to 9 registers
+UINT32_BLOCKS = tuple(struct.Struct(f'<{n}I') for n in range(10))
+
+# Decoded instruction: (handler, operands, size)
+Instruction = tuple[Callable[..., None], tuple[Any, ...], int]
 
-def loadbin(filename: str, mem: bytearray, offset: int = 0) -> None:
+
+def loadbin(filename: str, mem: bytearray, offset: int = 0) -> int:
+    # Read straight into the memory block, a file larger than the block is cut off at its end
     with open(filename, 'rb') as fp:
-        b = fp.read()
-    mem[offset:len(b)+offset] = b
+        return fp.readinto(memoryview(mem)[offset:])
 
 
 def sign_extend(value: int, no_bits_in: int) -> int:
-    sign = (value >> (no_bits_in - 1)) & 1
-    sign_bits = ~(~0 << (32 - no_bits_in))
-    return ctypes.c_int32(((sign_bits if sign else 0) << no_bits_in) | value).value
+    sign = 1 << (no_bits_in - 1)
+    return ((value & ((sign << 1) - 1)) ^ sign) - sign
+
+
+def sign_extend_byte(value: int) -> int:
+    return (value ^ 0x80) - 0x80
 
 
 def add_with_carry(x: int, y: int, carry_in: bool) -> tuple[int, bool, bool]:
     x &= 0xFFFFFFFF
     y &= 0xFFFFFFFF
     unsigned_sum = x + y + carry_in
-    signed_sum = sign_extend(x, 32) + sign_extend(y, 32) + carry_in
     result = unsigned_sum & 0xFFFFFFFF
-    carry_out = False if result == unsigned_sum else True
-    overflow = False if sign_extend(result, 32) == signed_sum else True
+    carry_out = unsigned_sum > 0xFFFFFFFF
+    # Signed overflow when both operands have the same sign and the result has the other one
+    overflow = ((x ^ result) & (y ^ result)) >> 31 == 1
     return (result, carry_out, overflow)
 
 
+def subtract(x: int, y: int) -> tuple[int, bool, bool]:
+    # Same result and flags as add_with_carry(x, ~y, True) for 32-bit unsigned x and y, carry means no borrow
+    result = (x - y) & 0xFFFFFFFF
+    overflow = ((x ^ y) & (x ^ result)) >> 31 == 1
+    return (result, x >= y, overflow)
+
+
+def condition_holds(cond: int, nzcv: int) -> bool:
+    n = bool(nzcv & 0b1000)
+    z = bool(nzcv & 0b0100)
+    c = bool(nzcv & 0b0010)
+    v = bool(nzcv & 0b0001)
+    if (cond >> 1) == 0b000:  # EQ or NE
+        result = z
+    elif (cond >> 1) == 0b001:  # CS or CC
+        result = c
+    elif (cond >> 1) == 0b010:  # MI or PL
+        result = n
+    elif (cond >> 1) == 0b011:  # VS or VC
+        result = v
+    elif (cond >> 1) == 0b100:  # HI or LS
+        result = c and not z
+    elif (cond >> 1) == 0b101:  # GE or LT
+        result = (n == v)
+    elif (cond >> 1) == 0b110:  # GT or LE
+        result = (n == v) and not z
+    else:  # AL
+        result = True
+
+    if (cond & 1) and cond != 0b1111:
+        return not result
+    else:
+        return result
+
+
+# Bit nzcv of COND_TABLE[cond] is set when condition cond passes for those APSR flags
+COND_TABLE = tuple(sum(condition_holds(cond, nzcv) << nzcv for nzcv in range(16)) for cond in range(16))
+
+
 class Rp2040:
 
     def __init__(self):
         self.on_break: Callable[[int], None] = self.on_break_default
         self.stopped = False
         self.stop_reason = 0
-        self.registers = array.array('l', 16*[0])
+        self.registers = (ctypes.c_uint32 * 16)()
         self.xpsr: int = 0
         self.epsr_t = True
         self.primask_pm: bool = False
@@ -73,18 +133,23 @@ class Rp2040:
         self.pc_previous = PC_START
         self.sp = SP_START
         self.mpu = Mpu()
-        rom_region = ByteArrayMemory(ROM_START, ROM_SIZE)
-        sram_region = ByteArrayMemory(SRAM_START, SRAM_SIZE)
-        flash_region = ByteArrayMemory(FLASH_START, FLASH_SIZE, 0xFF)
-        self.rom = rom_region.memory
-        self.sram = sram_region.memory
-        self.flash = flash_region.memory
-        self.mpu.register_region("flash", flash_region)
-        self.mpu.register_region("sram", sram_region)
-        self.mpu.register_region("rom", rom_region)
+        # Keep direct references to the regions with statically known addresses (code fetch, stack)
+        self.rom_region = ByteArrayMemory(ROM_START, ROM_SIZE)
+        self.sram_region = ByteArrayMemory(SRAM_START, SRAM_SIZE)
+        self.flash_region = ByteArrayMemory(FLASH_START, FLASH_SIZE, 0xFF)
+        self.sio = Sio()
+        self.uart0 = Uart()
+        self.rom = self.rom_region.memory
+        self.sram = self.sram_region.memory
+        self.flash = self.flash_region.memory
+        self.sram_words = self.sram_region.words
+        self.flash_words = self.flash_region.words
+        self.mpu.register_region("flash", self.flash_region)
+        self.mpu.register_region("sram", self.sram_region)
+        self.mpu.register_region("rom", self.rom_region)
         self.mpu.register_region("cortex0", CortexRegisters())
-        self.mpu.register_region("sio", Sio())
-        self.mpu.register_region("uart0", Uart())
+        self.mpu.register_region("sio", self.sio)
+        self.mpu.register_region("uart0", self.uart0)
         self.mpu.register_region("xip_ssi", XipSsi())
         self.mpu.register_region("resets", Resets())
         self.mpu.register_region("xosc", Xosc())
@@ -92,10 +157,14 @@ class Rp2040:
         self.mpu.register_region("pll_sys", Pll())
         self.mpu.register_region("pll_usb", Pll(base_address=PLL_USB_BASE))
         self.mpu.register_region("timer", Timer())
+        self.decode_cache: dict[int, Instruction] = {}
+        # Decoded instructions are cached, so drop them when the code they were decoded from changes
+        self.rom_region.on_write = self.invalidate_decode_cache
+        self.flash_region.on_write = self.invalidate_decode_cache
 
     def init_from_bootrom(self):
-        self.sp = self.mpu.regions["rom"].read(0)
-        self.pc = self.mpu.regions["rom"].read(4) & 0xfffffffe
+        self.sp = self.rom_region.read(0)
+        self.pc = self.rom_region.read(4) & 0xfffffffe
 
     @property
     def pc(self) -> int:
@@ -194,721 +263,706 @@ class Rp2040:
         else:
             self.xpsr &= ~(1 << 24)
 
+    def set_nz(self, result: int) -> None:
+        # Update the N and Z flags from a 32-bit result with a single store, C and V are kept
+        self.xpsr = (self.xpsr & 0x3fffffff) | (result & 0x80000000) | (result == 0) << 30
+
+    def set_nzc(self, result: int, carry: int) -> None:
+        # Update the N, Z and C flags of a shift with a single store, V is kept
+        self.xpsr = (self.xpsr & 0x1fffffff) | (result & 0x80000000) | (result == 0) << 30 | carry << 29
+
+    def set_nzcv(self, result: int, carry: bool, overflow: bool) -> None:
+        # Update all four APSR flags from a 32-bit result with a single store
+        self.xpsr = ((self.xpsr & 0x0fffffff) | (result & 0x80000000) | (result == 0) << 30
+                     | carry << 29 | overflow << 28)
+
+    def read_uint32(self, address: int) -> int:
+        # Data loads mostly hit SRAM or constant data in flash, only peripherals need the MPU
+        if SRAM_START <= address <= SRAM_END - 4:
+            if not address & 3:
+                return self.sram_words[(address - SRAM_START) >> 2]
+            return unpack_uint32(self.sram, address - SRAM_START)[0]
+        if FLASH_START <= address <= FLASH_END - 4:
+            if not address & 3:
+                return self.flash_words[(address - FLASH_START) >> 2]
+            return unpack_uint32(self.flash, address - FLASH_START)[0]
+        return self.mpu.read_uint32(address)
+
+    def read_sram_uint32(self, address: int) -> int:
+        if SRAM_START <= address <= SRAM_END - 4:
+            if not address & 3:
+                return self.sram_words[(address - SRAM_START) >> 2]
+            return unpack_uint32(self.sram, address - SRAM_START)[0]
+        return self.mpu.read_uint32(address)
+
+    def write_sram_uint32(self, address: int, value: int) -> None:
+        if SRAM_START <= address <= SRAM_END - 4:
+            if not address & 3:
+                self.sram_words[(address - SRAM_START) >> 2] = value
+            else:
+                pack_uint32(self.sram, address - SRAM_START, value)
+        else:
+            self.mpu.write_uint32(address, value)
+
     def str_registers(self, registers: Iterable[int] = range(16)) -> str:
         return '\t'.join([f"R[{i:02}]: {self.registers[i]:#010x}" for i in registers])
 
+    def dump_state(self) -> None:
+        # One log record for the special registers and the register file, four registers per line
+        lines = [f"PC: {self.pc:#010x}\tSP: {self.sp:#010x}\txPSR: {self.xpsr:#010x}"]
+        lines.extend(self.str_registers(registers=range(i, i + 4)) for i in range(0, 16, 4))
+        logger.info('\n'.join(lines))
+
     def condition_passed(self, cond: int) -> bool:
-        if (cond >> 1) == 0b000:  # EQ or NE
-            result = self.apsr_z
-        elif (cond >> 1) == 0b001:  # CS or CC
-            result = self.apsr_c
-        elif (cond >> 1) == 0b010:  # MI or PL
-            result = self.apsr_n
-        elif (cond >> 1) == 0b011:  # VS or VC
-            result = self.apsr_v
-        elif (cond >> 1) == 0b100:  # HI or LS
-            result = self.apsr_c and not self.apsr_z
-        elif (cond >> 1) == 0b101:  # GE or LT
-            result = (self.apsr_n == self.apsr_v)
-        elif (cond >> 1) == 0b110:  # GT or LE
-            result = (self.apsr_n == self.apsr_v) and not self.apsr_z
-        else:  # AL
-            result = True
-
-        if (cond & 1) and cond != 0b1111:
-            return not result
+        return bool((COND_TABLE[cond] >> (self.xpsr >> 28)) & 1)
+
+    def invalidate_decode_cache(self) -> None:
+        # Clear in place, so loops holding a reference to the cache see the flush as well
+        self.decode_cache.clear()
+
+    def predecode(self, address: int, size: int) -> None:
+        '''
+        Decode every halfword of a loaded code image into the decode cache, so running it only does cache hits.
+        '''
+        for pc in range(address & ~1, address + size, 2):
+            if pc not in self.decode_cache:
+                self.fetch_instruction(pc)
+
+    def fetch_instruction(self, pc: int) -> Instruction:
+        # Code is almost always executed from flash, so bypass the MPU for those fetches. Both halfwords are
+        # unpacked at once, the second one is only used by 32-bit instructions.
+        if FLASH_START <= pc <= FLASH_END - 4:
+            opcode, opcode2 = unpack_uint16_pair(self.flash, pc - FLASH_START)
+        else:
+            opcode = self.mpu.read_uint16(pc)
+            opcode2 = -1
+        size = 2
+        if (opcode >> 12) == 0b1111:
+            if opcode2 < 0:
+                opcode2 = self.mpu.read_uint16(pc + 2)
+            size = 4
+            handler, operands = decode_instruction(opcode, opcode2)
         else:
-            return result
+            handler, operands = DECODE_TABLE[opcode]
+        instruction = (handler, operands, size)
+        # Only ROM and flash are cached, their contents only change through writes that flush the cache
+        if pc < SRAM_START:
+            self.decode_cache[pc] = instruction
+        return instruction
 
     def execute_instruction(self) -> None:
-        logger.info("")
-        logger.info(f"PC: {self.pc:#010x}\tSP: {self.sp:#010x}\txPSR: {self.xpsr:#010x}")
-        # TODO: Opcode loading can be sped up by referencing the XIP flash directly
-        opcode = self.mpu.read_uint16(self.pc)
-        self.pc_previous = self.pc
-        self.pc += 2
-        opcode2 = 0
-        if (opcode >> 12) == 0b1111:
-            # instr_loc = self.pc - FLASH_START
-            # opcode2 = int.from_bytes(self.flash[instr_loc:instr_loc+2], "little")
-            opcode2 = self.mpu.read_uint16(self.pc)
-            self.pc += 2
-
-        logger.info(self.str_registers(registers=range(4)))
-        logger.info(self.str_registers(registers=range(4, 8)))
-        logger.info(self.str_registers(registers=range(8, 12)))
-        logger.info(self.str_registers(registers=range(12, 16)))
-
-        # ADC
-        if (opcode >> 6) == 0b0100000101:
+        if __debug__ and DEBUG_REGISTERS:
+            self.dump_state()
+        registers = self.registers
+        pc = registers[15]
+        instruction = self.decode_cache.get(pc)
+        if instruction is None:
+            instruction = self.fetch_instruction(pc)
+        handler, operands, size = instruction
+        self.pc_previous = pc
+        registers[15] = pc + size
+        handler(self, *operands)
+
+    def op_adc(self, m: int, dn: int) -> None:
+        # TODO: special case for SP register (13)
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  ADC instruction...")
-            m = (opcode >> 3) & 0x07
-            dn = opcode & 0x7
-            # TODO: special case for SP register (13)
             logger.debug(f"    Add R[{m}] to R[{dn}] with carry")
-            result, c, v = add_with_carry(self.registers[dn], self.registers[m], self.apsr_c)
-            self.registers[dn] = result
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-            self.apsr_c = c
-            self.apsr_v = v
-        # ADD (immediate) T1
-        elif (opcode >> 9) == 0b0001110:
+        registers = self.registers
+        result, c, v = add_with_carry(registers[dn], registers[m], (self.xpsr >> 29) & 1)
+        registers[dn] = result
+        self.set_nzcv(result, c, v)
+
+    def op_add_imm_t1(self, imm: int, n: int, d: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  ADD (immediate) T1 instruction...")
-            imm = ((opcode >> 6) & 0x7)
-            n = ((opcode >> 3) & 0x7)
-            d = opcode & 0x7
             logger.debug(f"    Add {imm:#x} to R[{n}]\tDestination: R[{d}] ...")
-            result, c, v = add_with_carry(self.registers[n], imm, False)
-            self.registers[d] = result
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-            self.apsr_c = c
-            self.apsr_v = v
-        # ADD (immediate) T2
-        elif (opcode >> 11) == 0b00110:
+        result, c, v = add_with_carry(self.registers[n], imm, False)
+        self.registers[d] = result
+        self.set_nzcv(result, c, v)
+
+    def op_add_imm_t2(self, dn: int, imm: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  ADD (immediate) T2 instruction...")
-            dn = ((opcode >> 8) & 0x7)
-            imm = opcode & 0xFF
             logger.debug(f"    Add {imm:#x} to R[{dn}] ...")
-            result, c, v = add_with_carry(self.registers[dn], imm, False)
-            self.registers[dn] = result
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-            self.apsr_c = c
-            self.apsr_v = v
-        # ADD (register) T1
-        elif (opcode >> 9) == 0b0001100:
+        result, c, v = add_with_carry(self.registers[dn], imm, False)
+        self.registers[dn] = result
+        self.set_nzcv(result, c, v)
+
+    def op_add_reg_t1(self, m: int, n: int, d: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  ADD (register) T1 instruction...")
-            m = ((opcode >> 6) & 0x7)
-            n = ((opcode >> 3) & 0x7)
-            d = opcode & 0x7
             logger.debug(f"    Add R[{n}] to R[{m}]\tDestination: R[{d}] ...")
-            result, c, v = add_with_carry(self.registers[n], self.registers[m], False)
-            self.registers[d] = result
-            if d != 15:
-                self.apsr_n = bool(result & (1 << 31))
-                self.apsr_z = bool(result == 0)
-                self.apsr_c = c
-                self.apsr_v = v
-        # ADD (register) T2
-        elif (opcode >> 8) == 0b01000100:
+        registers = self.registers
+        result, c, v = add_with_carry(registers[n], registers[m], False)
+        registers[d] = result
+        if d != 15:
+            self.set_nzcv(result, c, v)
+
+    def op_add_reg_t2(self, dn: int, m: int) -> None:
+        # TODO: special case for SP register (13)
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  ADD (register) T2 instruction...")
-            dn = ((opcode >> 4) & 0x08) | (opcode & 0x7)
-            m = (opcode >> 3) & 0xF
-            # TODO: special case for SP register (13)
             logger.debug(f"    Source R[{m}]\tDestination R[{dn}]")
-            self.registers[dn] = self.registers[m] + self.registers[dn]
-        # ADD (SP plus immediate) T1
-        elif (opcode >> 11) == 0b10101:
+        registers = self.registers
+        registers[dn] = registers[m] + registers[dn]
+
+    def op_add_sp_imm_t1(self, d: int, imm32: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  ADD (SP plus immediate) T1 instruction...")
-            imm32 = (opcode & 0xFF) << 2
-            d = (opcode >> 8) & 0x7
             logger.debug(f"    ADD r{d}, sp, #{imm32}...")
-            result, c, v = add_with_carry(self.sp, imm32, False)
-            self.registers[d] = result
-        # ADD (SP plus immediate) T2
-        elif (opcode >> 7) == 0b101100000:
+        self.registers[d] = self.registers[13] + imm32
+
+    def op_add_sp_imm_t2(self, imm32: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  ADD (SP plus immediate) T2 instruction...")
-            imm32 = (opcode & 0x7F) << 2
             logger.debug(f"    Add {imm32:#x} to SP...")
-            result, c, v = add_with_carry(self.sp, imm32, False)
-            self.sp = result
-        # ADR
-        elif (opcode >> 11) == 0b10100:
+        self.registers[13] += imm32
+
+    def op_adr(self, d: int, imm32: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  ADR instruction...")
-            d = (opcode >> 8) & 0x7
-            imm32 = (opcode & 0xff) << 2
             logger.debug(f"    Value [{imm32}]+PC \tDestination R[{d}]")
-            self.registers[d] = (self.pc & 0xfffffffc) + imm32
-        # AND
-        elif (opcode >> 6) == 0b0100000000:
+        self.registers[d] = (self.registers[15] & 0xfffffffc) + imm32
+
+    def op_and(self, m: int, dn: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  AND instruction...")
-            m = ((opcode >> 3) & 0x7)
-            dn = opcode & 0x7
             logger.debug(f"    AND r{dn}, r{m}...")
-            result = self.registers[dn] & self.registers[m]
-            self.registers[dn] = result
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-        # ASR (immediate)
-        elif (opcode >> 11) == 0b00010:
+        registers = self.registers
+        result = registers[dn] & registers[m]
+        registers[dn] = result
+        self.set_nz(result)
+
+    def op_asr_imm(self, m: int, d: int, shift_n: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  ASR (immediate) instruction...")
-            m = (opcode >> 3) & 0x07
-            d = opcode & 0x07
-            imm5 = (opcode >> 6) & 0x1F
-            shift_n = imm5 if imm5 != 0 else 32
             logger.debug(f"    Source R[{m}]\tDestination R[{d}]\tShift amount [{shift_n}]")
-            if shift_n < 32:
-                result = sign_extend(self.registers[m] >> shift_n, 32 - shift_n)
-            else:
-                result = sign_extend(self.registers[m] >> 31, 1)
-            self.registers[d] = result & 0xFFFFFFFF
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-            self.apsr_c = bool((self.registers[m] >> (shift_n - 1)) & 1)
-        # B T1
-        elif ((opcode >> 12) == 0b1101) and (((opcode >> 9) & 0x7) != 0b111):
+        # Shift the signed value, a shift by 32 leaves only the sign
+        value = self.registers[m]
+        result = ((value ^ 0x80000000) - 0x80000000) >> shift_n
+        self.registers[d] = result
+        self.set_nzc(result, (value >> (shift_n - 1)) & 1)
+
+    def op_b_t1(self, cond_mask: int, imm32: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  B T1 instruction...")
-            imm8 = opcode & 0xff
-            cond = (opcode >> 8) & 0xf
-            imm32 = sign_extend(imm8 << 1, 9)
             logger.debug(f"    {imm32=}")
-            if self.condition_passed(cond):
+        # The condition is decoded to its COND_TABLE mask, test it against the current NZCV flags
+        if (cond_mask >> (self.xpsr >> 28)) & 1:
+            if __debug__ and DEBUG_INSTRUCTIONS:
                 logger.debug(f"    Branch to: {(self.pc + imm32 + 2):#010x}")
-                self.pc += imm32 + 2
-            else:
-                logger.debug(f"    Condition False. Will NOT branch to: {(self.pc + imm32 + 2):#010x}")
-        # B T2
-        elif (opcode >> 11) == 0b11100:
+            self.registers[15] += imm32 + 2
+        elif __debug__ and DEBUG_INSTRUCTIONS:
+            logger.debug(f"    Condition False. Will NOT branch to: {(self.pc + imm32 + 2):#010x}")
+
+    def op_b_t2(self, imm32: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  B T2 instruction...")
-            imm11 = opcode & 0x7ff
-            imm32 = sign_extend(imm11 << 1, 12)
             logger.debug(f"    {imm32=}")
             logger.debug(f"    Branch to: {(self.pc + imm32 + 2):#010x}")
-            self.pc += imm32 + 2
-        # BIC
-        elif (opcode >> 6) == 0b0100001110:
+        self.registers[15] += imm32 + 2
+
+    def op_bic(self, dn: int, m: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  BIC instruction...")
-            dn = opcode & 0x7
-            m = (opcode >> 3) & 0x7
-            result = self.registers[dn] & ~self.registers[m]
-            self.registers[dn] = result
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-        # BKPT
-        elif (opcode >> 8) == 0b10111110:
-            imm8 = opcode & 0xff
+        registers = self.registers
+        result = registers[dn] & ~registers[m]
+        registers[dn] = result
+        self.set_nz(result)
+
+    def op_bkpt(self, imm8: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug(" BKPT instruction...")
-            self.on_break(imm8)
-        # BL
-        elif ((opcode >> 11) == 0b11110) and ((opcode2 >> 14) == 0b11):
+        self.on_break(imm8)
+
+    def op_bl(self, imm32: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  BL instruction...")
-            imm10 = opcode & 0x3ff
-            imm11 = opcode2 & 0x7ff
-            j1 = bool(opcode2 & 0x2000)
-            j2 = bool(opcode2 & 0x800)
-            s = bool(opcode & 0x400)
-            i1 = not (j1 ^ s)
-            i2 = not (j2 ^ s)
-            logger.debug(f"    {j1=} {j2=} {s=} {i1=} {i2=} {imm10=} {imm11=}")
-            imm23 = int(i1) << 23 | int(i2) << 22 | imm10 << 12 | imm11 << 1
-            imm32 = sign_extend(imm23, 23)
             logger.debug(f"    {imm32=}")
             logger.debug(f"    Branch to: {(self.pc + imm32):#010x}")
-            self.lr = self.pc | 0x1
-            self.pc += imm32
-        # BLX
-        elif (opcode >> 7) == 0b010001111:
+        registers = self.registers
+        registers[14] = registers[15] | 0x1
+        registers[15] += imm32
+
+    def op_blx(self, m: int) -> None:
+        address = self.registers[m] & 0xfffffffe
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  BLX instruction...")
-            m = (opcode >> 3) & 0xf
-            address = self.registers[m] & 0xfffffffe
             logger.debug(f"    Branch to: {address:#010x}")
-            self.lr = self.pc | 0x1
-            self.pc = address
-        # BX
-        elif (opcode >> 7) == 0b010001110:
+        registers = self.registers
+        registers[14] = registers[15] | 0x1
+        registers[15] = address
+
+    def op_bx(self, m: int) -> None:
+        # TODO: handle exception cases
+        address = self.registers[m] & 0xfffffffe
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  BX instruction...")
-            m = (opcode >> 3) & 0xf
-            # TODO: handle exception cases
-            address = self.registers[m] & 0xfffffffe
             logger.debug(f"    Branch to: {address:#010x}")
-            self.pc = address
-        # CMP (immediate)
-        elif (opcode >> 11) == 0b00101:
+        self.registers[15] = address
+
+    def op_cmp_imm(self, n: int, imm: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  CMP (immediate) instruction...")
-            n = ((opcode >> 8) & 0x7)
-            imm = opcode & 0xFF
             logger.debug(f"    Compare R[{n}] with {imm:#x}...")
-            result, c, v = add_with_carry(self.registers[n], ~imm, True)
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-            self.apsr_c = c
-            self.apsr_v = v
-        # CMP (register) T1
-        elif (opcode >> 6) == 0b0100001010:
+        result, c, v = subtract(self.registers[n], imm)
+        self.set_nzcv(result, c, v)
+
+    def op_cmp_reg_t1(self, m: int, n: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  CMP (register) T1 instruction...")
-            m = ((opcode >> 3) & 0x7)
-            n = opcode & 0x7
             logger.debug(f"    Compare R[{n}] with R[{m}]...")
-            result, c, v = add_with_carry(self.registers[n], ~self.registers[m], True)
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-            self.apsr_c = c
-            self.apsr_v = v
-        # CMP (register) T2
-        elif (opcode >> 8) == 0b01000101:
+        result, c, v = subtract(self.registers[n], self.registers[m])
+        self.set_nzcv(result, c, v)
+
+    def op_cmp_reg_t2(self, n: int, m: int) -> None:
+        # TODO: special case for SP register (13)
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  CMP (register) T2 instruction...")
-            n = ((opcode >> 4) & 0x08) | (opcode & 0x7)
-            m = (opcode >> 3) & 0xF
-            # TODO: special case for SP register (13)
             logger.debug(f"    CMP r{n}, r{m}")
-            result, c, v = add_with_carry(self.registers[n], ~self.registers[m], True)
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-            self.apsr_c = c
-            self.apsr_v = v
-        # CPS
-        elif (opcode >> 5) == 0b10110110011:
+        result, c, v = subtract(self.registers[n], self.registers[m])
+        self.set_nzcv(result, c, v)
+
+    def op_cps(self, im: int) -> None:
+        effect = 'ID' if im == 1 else 'IE'
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  CPS instruction...")
-            im = ((opcode >> 4) & 0x1)
-            effect = 'ID' if im == 1 else 'IE'
             logger.debug(f"    CPS{effect} i...")
-            # TODO: only execute when in privileged mode
-            self.primask_pm = bool(im)
-        # DMB
-        elif (opcode == 0b1111001110111111) and ((opcode2 >> 4) == 0b100011110101):
-            # assert (opcode2 & 0xf) == 0b1111  # Apparently other options are used by the compiler
+        # TODO: only execute when in privileged mode
+        self.primask_pm = bool(im)
+
+    def op_dmb(self) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("    DMB sy")
-            pass
-        # EOR
-        elif (opcode >> 6) == 0b0100000001:
-            m = ((opcode >> 3) & 0x7)
-            dn = opcode & 0x7
+
+    def op_eor(self, m: int, dn: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug(f"    EOR r{dn}, r{m}")
-            result = self.registers[dn] ^ self.registers[m]
-            self.registers[dn] = result
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-        # LDM
-        elif (opcode >> 11) == 0b11001:
+        registers = self.registers
+        result = registers[dn] ^ registers[m]
+        registers[dn] = result
+        self.set_nz(result)
+
+    def op_ldm(self, n: int, register_list: tuple[int, ...], wback: bool) -> None:
+        registers = self.registers
+        address = registers[n]
+        end = address + 4 * len(register_list)
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  LDM instruction...")
-            n = (opcode >> 8) & 0x7
-            register_list = opcode & 0xff
-            address = self.registers[n]
-            wback = not ((register_list >> n) & 1)
-            logger.debug(f"    Destination registers[{register_list:#b}]\tSource address [{address:#010x}]")
-            for i in range(8):
-                if (register_list >> i) & 1:
-                    self.registers[i] = self.mpu.read_uint32(address)
-                    address += 4
-            if wback:
-                self.registers[n] += 4 * register_list.bit_count()
-        # LDR (immediate)
-        elif (opcode >> 11) == 0b01101:
+            logger.debug(f"    Destination registers{list(register_list)}\tSource address [{address:#010x}]")
+        if SRAM_START <= address and end <= SRAM_END:
+            values = UINT32_BLOCKS[len(register_list)].unpack_from(self.sram, address - SRAM_START)
+            for i, value in zip(register_list, values):
+                registers[i] = value
+        else:
+            for i in register_list:
+                registers[i] = self.mpu.read_uint32(address)
+                address += 4
+        if wback:
+            registers[n] = end
+
+    def op_ldr_imm_t1(self, n: int, t: int, imm: int) -> None:
+        address = self.registers[n] + imm
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  LDR (immediate) instruction...")
-            n = (opcode >> 3) & 0x7
-            t = opcode & 0x7
-            imm = ((opcode >> 6) & 0x1F) << 2
-            address = self.registers[n] + imm
             logger.debug(f"    Destination R[{t}]\tSource address [{address:#010x}]")
-            self.registers[t] = self.mpu.read_uint32(address)
-        # LDR immediate (T2)
-        elif (opcode >> 11) == 0b10011:
+        self.registers[t] = self.read_uint32(address)
+
+    def op_ldr_imm_t2(self, t: int, imm32: int) -> None:
+        address = self.registers[13] + imm32
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  LDR (immediate) T2 instruction...")
-            t = (opcode >> 8) & 0x7
-            imm32 = (opcode & 0xff) << 2
-            address = self.registers[13] + imm32
             logger.debug(f"    Source address [{address:#010x}]\tDestination R[{t}]")
-            self.registers[t] = self.mpu.read_uint32(address)
-        # LDR (literal)
-        elif (opcode >> 11) == 0b01001:
+        self.registers[t] = self.read_sram_uint32(address)
+
+    def op_ldr_literal(self, t: int, imm: int) -> None:
+        registers = self.registers
+        base = (registers[15] + 2) & 0xfffffffc
+        address = base + imm
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  LDR (literal) instruction...")
-            t = (opcode >> 8) & 0x7
-            imm = (opcode & 0xFF) << 2
-            base = (self.pc + 2) & 0xfffffffc
-            address = base + imm
             logger.debug(f"    Destination R[{t}]\tSource address [{address:#010x}]")
-            self.registers[t] = self.mpu.read_uint32(address)
-        # LDR (register)
-        elif (opcode >> 9) == 0b0101100:
+        # Literal pools sit next to the code, so normally in flash. The address is always word aligned.
+        if FLASH_START <= address <= FLASH_END - 4:
+            registers[t] = self.flash_words[(address - FLASH_START) >> 2]
+        else:
+            registers[t] = self.mpu.read_uint32(address)
+
+    def op_ldr_reg(self, m: int, n: int, t: int) -> None:
+        registers = self.registers
+        address = registers[n] + registers[m]
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  LDR (register) instruction...")
-            m = (opcode >> 6) & 0x7
-            n = (opcode >> 3) & 0x7
-            t = opcode & 0x7
-            address = self.registers[n] + self.registers[m]
             logger.debug(f"    LDR r{t}, [r{n}, r{m}]")
-            self.registers[t] = self.mpu.read_uint32(address)
-        # LDRB (immediate)
-        elif (opcode >> 11) == 0b01111:
+        registers[t] = self.read_uint32(address)
+
+    def op_ldrb_imm(self, imm5: int, n: int, t: int) -> None:
+        address = self.registers[n] + imm5
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  LDRB (immediate) instruction...")
-            imm5 = (opcode >> 6) & 0x1F
-            n = (opcode >> 3) & 0x7
-            t = opcode & 0x7
-            address = self.registers[n] + imm5
             logger.debug(f"    Destination R[{t}]\tSource address [{address:#010x}]")
-            self.registers[t] = self.mpu.read_uint8(address)
-        # LDRB (register)
-        elif (opcode >> 9) == 0b0101110:
+        self.registers[t] = self.mpu.read_uint8(address)
+
+    def op_ldrb_reg(self, m: int, n: int, t: int) -> None:
+        registers = self.registers
+        address = registers[n] + registers[m]
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  LDRB (register) instruction...")
-            m = (opcode >> 6) & 0x7
-            n = (opcode >> 3) & 0x7
-            t = opcode & 0x7
-            address = self.registers[n] + self.registers[m]
             logger.debug(f"    LRDB r{t}, [r{n}, r{m}]")
-            self.registers[t] = self.mpu.read_uint8(address)
-        # LDRH (immediate)
-        elif (opcode >> 11) == 0b10001:
+        registers[t] = self.mpu.read_uint8(address)
+
+    def op_ldrh_imm(self, imm: int, n: int, t: int) -> None:
+        address = self.registers[n] + imm
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  LDRH (immediate) instruction...")
-            imm5 = (opcode >> 6) & 0x1F
-            n = (opcode >> 3) & 0x7
-            t = opcode & 0x7
-            address = self.registers[n] + (imm5 << 1)
             logger.debug(f"    Destination R[{t}]\tSource address [{address:#010x}]")
-            self.registers[t] = self.mpu.read_uint16(address)
-        # LDRSB (register)
-        elif (opcode >> 9) == 0b0101011:
+        self.registers[t] = self.mpu.read_uint16(address)
+
+    def op_ldrsb_reg(self, m: int, n: int, t: int) -> None:
+        registers = self.registers
+        address = registers[n] + registers[m]
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  LDRSB (register) instruction...")
-            m = (opcode >> 6) & 0x7
-            n = (opcode >> 3) & 0x7
-            t = opcode & 0x7
-            address = self.registers[n] + self.registers[m]
             logger.debug(f"    LRDSB r{t}, [r{n}, r{m}]")
-            self.registers[t] = sign_extend(self.mpu.read_uint8(address), 8) & 0xffffffff
-        # LDRSH (register)
-        elif (opcode >> 9) == 0b0101111:
+        registers[t] = sign_extend_byte(self.mpu.read_uint8(address))
+
+    def op_ldrsh_reg(self, m: int, n: int, t: int) -> None:
+        registers = self.registers
+        address = registers[n] + registers[m]
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  LDRSH (register) instruction...")
-            m = (opcode >> 6) & 0x7
-            n = (opcode >> 3) & 0x7
-            t = opcode & 0x7
-            address = self.registers[n] + self.registers[m]
             logger.debug(f"    Destination R[{t}]\tSource address [{address:#010x}]")
-            self.registers[t] = self.mpu.read_uint16(address)
-        # LSLS (immediate)
-        elif (opcode >> 11) == 0b00000:
+        registers[t] = self.mpu.read_uint16(address)
+
+    def op_lsl_imm(self, m: int, d: int, shift_n: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  LSLS (immediate) instruction...")
-            m = (opcode >> 3) & 0x07
-            d = opcode & 0x07
-            shift_n = (opcode >> 6) & 0x1F
             logger.debug(f"    Source R[{m}]\tDestination R[{d}]\tShift amount [{shift_n}]")
-            result = (self.registers[m] << shift_n) & 0xffffffff
-            carry = (self.registers[m] >> 32 - shift_n) & 1
-            self.registers[d] = result
-            if d != 15:  # This is actually MOV reg T2 encoding
-                self.apsr_n = bool(result & (1 << 31))
-                self.apsr_z = bool(result == 0)
-                if shift_n > 0:
-                    self.apsr_c = bool(carry)
-        # LSLS (register)
-        elif (opcode >> 6) == 0b0100000010:
+        value = self.registers[m]
+        result = (value << shift_n) & 0xffffffff
+        self.registers[d] = result
+        if d != 15:  # This is actually MOV reg T2 encoding
+            if shift_n > 0:
+                self.set_nzc(result, (value >> 32 - shift_n) & 1)
+            else:
+                self.set_nz(result)
+
+    def op_lsl_reg(self, m: int, d: int) -> None:
+        registers = self.registers
+        shift_n = registers[m] & 0xFF
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  LSLS (register) instruction...")
-            m = (opcode >> 3) & 0x7
-            d = opcode & 0x7
-            shift_n = self.registers[m] & 0xFF
             logger.debug(f"    Source and destination R[{d}]\tShift amount [{shift_n}]")
-            result = self.registers[d] << shift_n
-            self.registers[d] = result & 0xFFFFFFFF
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-            if shift_n > 0:
-                self.apsr_c = bool(result & (1 << 32))
-        # LSR (immediate)
-        elif (opcode >> 11) == 0b00001:
+        result = registers[d] << shift_n
+        registers[d] = result
+        if shift_n > 0:
+            self.set_nzc(result & 0xffffffff, (result >> 32) & 1)
+        else:
+            self.set_nz(result)
+
+    def op_lsr_imm(self, m: int, d: int, shift_n: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  LSR (immediate) instruction...")
-            m = (opcode >> 3) & 0x07
-            d = opcode & 0x07
-            imm5 = (opcode >> 6) & 0x1F
-            shift_n = imm5 if imm5 != 0 else 32
             logger.debug(f"    Source R[{m}]\tDestination R[{d}]\tShift amount [{shift_n}]")
-            result = self.registers[m] >> shift_n
-            self.registers[d] = result & 0xFFFFFFFF
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-            self.apsr_c = bool((self.registers[m] >> (shift_n - 1)) & 1)
-        # LSR (register)
-        elif (opcode >> 6) == 0b0100000011:
+        value = self.registers[m]
+        result = value >> shift_n
+        self.registers[d] = result
+        self.set_nzc(result, (value >> (shift_n - 1)) & 1)
+
+    def op_lsr_reg(self, m: int, dn: int) -> None:
+        registers = self.registers
+        shift_n = registers[m] & 0xff
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  LSR (register) instruction...")
-            m = (opcode >> 3) & 0x07
-            dn = opcode & 0x07
-            shift_n = self.registers[m] & 0xff
             logger.debug(f"    LSRS r{dn}, r{m}")
-            result = self.registers[dn] >> shift_n
-            carry = (self.registers[dn] >> (shift_n - 1)) & 1
-            self.registers[dn] = result & 0xFFFFFFFF
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-            self.apsr_c = bool(carry)
-        # MOV (immediate)
-        elif (opcode >> 11) == 0b00100:
+        value = registers[dn]
+        result = value >> shift_n
+        registers[dn] = result
+        if shift_n > 0:
+            self.set_nzc(result, (value >> (shift_n - 1)) & 1)
+        else:
+            self.set_nz(result)
+
+    def op_mov_imm(self, d: int, value: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  MOV (immediate) instruction...")
-            d = (opcode >> 8) & 0x07
-            value = opcode & 0xFF
             logger.debug(f"    Destination register is [{d}]\tValue is [{value}]")
-            self.registers[d] = value
-            self.apsr_n = bool(value & (1 << 31))
-            self.apsr_z = bool(value == 0)
-        # MOV (register)
-        elif (opcode >> 8) == 0b01000110:
+        self.registers[d] = value
+        self.set_nz(value)
+
+    def op_mov_reg(self, d: int, m: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  MOV (register) instruction...")
-            d = ((opcode >> 4) & 0x08) | (opcode & 0x7)
-            m = (opcode >> 3) & 0xF
             logger.debug(f"    Source R[{m}]\tDestination R[{d}]")
-            result = self.registers[m]
-            if d != 15:
-                self.registers[d] = result
-            else:
-                self.pc = result & 0xfffffffe
-        # MRS
-        elif (opcode == 0b1111001111101111) and ((opcode2 >> 12) == 0b1000):
+        registers = self.registers
+        result = registers[m]
+        if d != 15:
+            registers[d] = result
+        else:
+            registers[15] = result & 0xfffffffe
+
+    def op_mrs(self, d: int, sysm: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  MRS instruction...")
-            d = (opcode2 >> 8) & 0xf
-            sysm = opcode2 & 0xff
             logger.debug(f"    Source SYSm[{sysm}]\tDestination R[{d}]")
-            # TODO: other registers like APSR, PRIMASK, etc
-            # TODO: privileged and unprivileged mode
-            self.registers[d] = 0  # Always set result register to zero first
-            if sysm >> 3 == 0:
-                if sysm & 1:
-                    self.registers[d] |= self.ipsr
-        # MSR
-        elif ((opcode >> 5) == 0b11110011100) and ((opcode2 >> 14) == 0b10):
+        # TODO: other registers like APSR, PRIMASK, etc
+        # TODO: privileged and unprivileged mode
+        self.registers[d] = 0  # Always set result register to zero first
+        if sysm >> 3 == 0:
+            if sysm & 1:
+                self.registers[d] |= self.ipsr
+
+    def op_msr(self, n: int, sysm: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  MSR instruction...")
-            n = opcode & 0xf
-            sysm = opcode2 & 0xff
             logger.debug(f"    Source R[{n}]\tDestination SYSm[{sysm}]")
-            # TODO: other registers like APSR, PRIMASK, etc
-            # TODO: privileged and unprivileged mode
-            if sysm >> 3 == 1:  # SP
-                if sysm & 0x7 == 0:  # MSP = SP_main
-                    self.sp = self.registers[n] & 0xfffffffc
-        # MUL
-        elif (opcode >> 6) == 0b0100001101:
+        # TODO: other registers like APSR, PRIMASK, etc
+        # TODO: privileged and unprivileged mode
+        if sysm >> 3 == 1:  # SP
+            if sysm & 0x7 == 0:  # MSP = SP_main
+                self.registers[13] = self.registers[n] & 0xfffffffc
+
+    def op_mul(self, dm: int, n: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  MUL instruction...")
-            dm = (opcode & 0x7)
-            n = (opcode >> 3) & 0x7
             logger.debug(f"    MUL r{dm}, r{n}")
-            result = (self.registers[dm] * self.registers[n]) & 0xffffffff
-            self.registers[dm] = result
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-        # MVN
-        elif (opcode >> 6) == 0b0100001111:
+        registers = self.registers
+        result = (registers[dm] * registers[n]) & 0xffffffff
+        registers[dm] = result
+        self.set_nz(result)
+
+    def op_mvn(self, m: int, d: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  MVN instruction...")
-            m = ((opcode >> 3) & 0x7)
-            d = opcode & 0x7
             logger.debug(f"    Bitwise NOT on R[{m}] and store in R[{d}]...")
-            result = ~self.registers[m] & 0xffffffff
-            self.registers[d] = result
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-        # ORR
-        elif (opcode >> 6) == 0b0100001100:
+        result = ~self.registers[m] & 0xffffffff
+        self.registers[d] = result
+        self.set_nz(result)
+
+    def op_orr(self, m: int, dn: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  ORR instruction...")
-            m = ((opcode >> 3) & 0x7)
-            dn = opcode & 0x7
             logger.debug(f"    ORR r{dn}, r{m}...")
-            result = self.registers[dn] | self.registers[m]
-            self.registers[dn] = result
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-        # POP
-        elif (opcode >> 9) == 0b1011110:
+        registers = self.registers
+        result = registers[dn] | registers[m]
+        registers[dn] = result
+        self.set_nz(result)
+
+    def op_pop(self, register_list: tuple[int, ...], p: bool) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  POP instruction...")
-            p = (opcode >> 8) & 0x1
-            register_list = (p << 15) | opcode & 0xff
-            address = self.sp
-            for i in range(8):
-                if (register_list & (1 << i)):
-                    self.registers[i] = self.mpu.read_uint32(address)
-                    address += 4
-            if p:
-                self.pc = self.mpu.read_uint32(address) & 0xfffffffe
-            self.sp += 4 * register_list.bit_count()
-        # PUSH
-        elif (opcode >> 9) == 0b1011010:
+        registers = self.registers
+        address = registers[13]
+        end = address + 4 * len(register_list)
+        # The stack lives in SRAM, so read all registers from it at once when it does
+        if SRAM_START <= address and end <= SRAM_END:
+            values = UINT32_BLOCKS[len(register_list)].unpack_from(self.sram, address - SRAM_START)
+            for i, value in zip(register_list, values):
+                registers[i] = value
+        else:
+            for i in register_list:
+                registers[i] = self.mpu.read_uint32(address)
+                address += 4
+        if p:
+            registers[15] &= 0xfffffffe
+        registers[13] = end
+
+    def op_push(self, register_list: tuple[int, ...]) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  PUSH instruction...")
-            bitcount = (opcode & 0x1FF).bit_count()
-            address = self.sp - 4 * bitcount
-            for i in range(8):
-                if (opcode & (1 << i)):
-                    self.mpu.write_uint32(address, self.registers[i])
-                    address += 4
-            if (opcode & (1 << 8)):  # 'M'-bit -> push LR register
-                self.mpu.write_uint32(address, self.registers[14])
-            self.sp -= 4 * bitcount
-        # REV
-        elif (opcode >> 6) == 0b1011101000:
+        registers = self.registers
+        sp = registers[13] - 4 * len(register_list)
+        # The stack lives in SRAM, so write all registers to it at once when it does
+        if SRAM_START <= sp and registers[13] <= SRAM_END:
+            UINT32_BLOCKS[len(register_list)].pack_into(self.sram, sp - SRAM_START,
+                                                        *[registers[i] for i in register_list])
+        else:
+            address = sp
+            for i in register_list:
+                self.mpu.write_uint32(address, registers[i])
+                address += 4
+        registers[13] = sp
+
+    def op_rev(self, m: int, d: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  REV instruction...")
-            m = ((opcode >> 3) & 0x7)
-            d = opcode & 0x7
             logger.debug(f"    REV r{d}, r{m}...")
-            value = self.registers[m]
-            result = (value & 0xff) << 24
-            result |= (value & 0xff00) << 8
-            result |= (value & 0xff0000) >> 8
-            result |= (value & 0xff000000) >> 24
-            self.registers[d] = result
-        # RSB / NEG
-        elif (opcode >> 6) == 0b0100001001:
+        self.registers[d] = unpack_uint32_be(pack_uint32_le(self.registers[m]))[0]
+
+    def op_rsb(self, n: int, d: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  RSB / NEG instruction...")
-            n = ((opcode >> 3) & 0x7)
-            d = opcode & 0x7
             logger.debug(f"    Subtract R[{n}] from 0 and store in R[{d}]...")
-            result, c, v = add_with_carry(~self.registers[n], 0, True)
-            self.registers[d] = result
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-            self.apsr_c = c
-            self.apsr_v = v
-        # SBC
-        elif (opcode >> 6) == 0b0100000110:
+        result, c, v = add_with_carry(~self.registers[n], 0, True)
+        self.registers[d] = result
+        self.set_nzcv(result, c, v)
+
+    def op_sbc(self, m: int, dn: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  SBC instruction...")
-            m = ((opcode >> 3) & 0x7)
-            dn = opcode & 0x7
             logger.debug(f"    SBCS r{dn}, r{m}")
-            result, c, v = add_with_carry(self.registers[dn], ~self.registers[m], self.apsr_c)
-            self.registers[dn] = result
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-            self.apsr_c = c
-            self.apsr_v = v
-        # SEV
-        elif opcode == 0b1011111101000000:
-            pass
-        # STM
-        elif (opcode >> 11) == 0b11000:
+        registers = self.registers
+        result, c, v = add_with_carry(registers[dn], ~registers[m], (self.xpsr >> 29) & 1)
+        registers[dn] = result
+        self.set_nzcv(result, c, v)
+
+    def op_sev(self) -> None:
+        pass
+
+    def op_stm(self, n: int, register_list: tuple[int, ...]) -> None:
+        registers = self.registers
+        address = registers[n]
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  STM instruction...")
-            n = (opcode >> 8) & 0x7
-            register_list = opcode & 0xff
-            address = self.registers[n]
-            logger.debug(f"    Source registers[{register_list:#b}]\tDestination address [{address:#010x}]")
-            for i in range(8):
-                if (register_list >> i) & 1:
-                    self.mpu.write_uint32(address, self.registers[i])
-                    address += 4
-            self.registers[n] += 4 * register_list.bit_count()
-        # STR immediate (T1)
-        elif (opcode >> 11) == 0b01100:
+            logger.debug(f"    Source registers{list(register_list)}\tDestination address [{address:#010x}]")
+        end = address + 4 * len(register_list)
+        # Store the whole block with one struct call when it lies in SRAM
+        if SRAM_START <= address and end <= SRAM_END:
+            UINT32_BLOCKS[len(register_list)].pack_into(self.sram, address - SRAM_START,
+                                                        *[registers[i] for i in register_list])
+        else:
+            for i in register_list:
+                self.mpu.write_uint32(address, registers[i])
+                address += 4
+        registers[n] = end
+
+    def op_str_imm_t1(self, n: int, t: int, imm: int) -> None:
+        address = self.registers[n] + imm
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  STR (immediate) T1 instruction...")
-            n = (opcode >> 3) & 0x7
-            t = opcode & 0x7
-            imm = ((opcode >> 6) & 0x1F) << 2
-            address = self.registers[n] + imm
             logger.debug(f"    Source R[{t}]\tDestination address [{address:#010x}]")
-            self.mpu.write_uint32(address, self.registers[t])
-        # STR immediate (T2)
-        elif (opcode >> 11) == 0b10010:
+        self.write_sram_uint32(address, self.registers[t])
+
+    def op_str_imm_t2(self, t: int, imm32: int) -> None:
+        address = self.registers[13] + imm32
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  STR (immediate) T2 instruction...")
-            t = (opcode >> 8) & 0x7
-            imm32 = (opcode & 0xff) << 2
-            address = self.registers[13] + imm32
             logger.debug(f"    Source R[{t}]\tDestination address [{address:#010x}]")
-            self.mpu.write_uint32(address, self.registers[t])
-        # STR register
-        elif (opcode >> 9) == 0b0101000:
+        self.write_sram_uint32(address, self.registers[t])
+
+    def op_str_reg(self, m: int, n: int, t: int) -> None:
+        registers = self.registers
+        address = registers[n] + registers[m]
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  STR (register) instruction...")
-            m = (opcode >> 6) & 0x7
-            n = (opcode >> 3) & 0x7
-            t = opcode & 0x7
-            address = self.registers[n] + self.registers[m]
             logger.debug(f"    Source R[{t}]\tDestination address [{address:#010x}]")
-            self.mpu.write_uint32(address, self.registers[t])
-        # STRB immediate
-        elif (opcode >> 11) == 0b01110:
-            imm5 = (opcode >> 6) & 0x1f
-            n = (opcode >> 3) & 0x7
-            t = opcode & 0x7
-            address = self.registers[n] + imm5
+        self.write_sram_uint32(address, registers[t])
+
+    def op_strb_imm(self, imm5: int, n: int, t: int) -> None:
+        address = self.registers[n] + imm5
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug(f"    STRB r{t}, [r{n}, #{imm5}]")
-            self.mpu.write(address, self.registers[t] & 0xff, num_bytes=1)
-        # STRB register
-        elif (opcode >> 9) == 0b0101010:
-            m = (opcode >> 6) & 0x7
-            n = (opcode >> 3) & 0x7
-            t = opcode & 0x7
-            address = self.registers[n] + self.registers[m]
+        self.mpu.write_uint8(address, self.registers[t])
+
+    def op_strb_reg(self, m: int, n: int, t: int) -> None:
+        registers = self.registers
+        address = registers[n] + registers[m]
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug(f"    STRB r{t}, [r{n}, r{m}]")
-            self.mpu.write(address, self.registers[t] & 0xff, num_bytes=1)
-        # STRH immediate
-        elif (opcode >> 11) == 0b10000:
-            imm = ((opcode >> 6) & 0x1f) << 1
-            n = (opcode >> 3) & 0x7
-            t = opcode & 0x7
-            address = self.registers[n] + imm
+        self.mpu.write_uint8(address, registers[t])
+
+    def op_strh_imm(self, imm: int, n: int, t: int) -> None:
+        address = self.registers[n] + imm
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug(f"    STRB r{t}, [r{n}, #{imm}]")
-            self.mpu.write(address, self.registers[t] & 0xffff, num_bytes=2)
-        # STRH register
-        elif (opcode >> 9) == 0b0101001:
-            m = (opcode >> 6) & 0x7
-            n = (opcode >> 3) & 0x7
-            t = opcode & 0x7
-            address = self.registers[n] + self.registers[m]
+        self.mpu.write_uint16(address, self.registers[t])
+
+    def op_strh_reg(self, m: int, n: int, t: int) -> None:
+        registers = self.registers
+        address = registers[n] + registers[m]
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug(f"    STRH r{t}, [r{n}, r{m}]")
-            self.mpu.write(address, self.registers[t] & 0xffff, num_bytes=2)
-        # SUB (immediate) T1
-        elif (opcode >> 9) == 0b0001111:
-            d = opcode & 0x7
-            n = (opcode >> 3) & 0x7
-            imm = (opcode >> 6) & 0x7
+        self.mpu.write_uint16(address, registers[t])
+
+    def op_sub_imm_t1(self, d: int, n: int, imm: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug(f"    SUBS r{d}, r{n}, #{imm}")
-            result, c, v = add_with_carry(self.registers[n], ~imm, True)
-            self.registers[d] = result
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-            self.apsr_c = c
-            self.apsr_v = v
-        # SUB (immediate) T2
-        elif (opcode >> 11) == 0b00111:
+        result, c, v = subtract(self.registers[n], imm)
+        self.registers[d] = result
+        self.set_nzcv(result, c, v)
+
+    def op_sub_imm_t2(self, dn: int, imm: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  SUB (immediate) T2 instruction...")
-            dn = ((opcode >> 8) & 0x7)
-            imm = opcode & 0xFF
             logger.debug(f"    Subtract {imm:#x} from R[{dn}]...")
-            result, c, v = add_with_carry(self.registers[dn], ~imm, True)
-            self.registers[dn] = result
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-            self.apsr_c = c
-            self.apsr_v = v
-        # SUB (register) T1
-        elif (opcode >> 9) == 0b0001101:
+        result, c, v = subtract(self.registers[dn], imm)
+        self.registers[dn] = result
+        self.set_nzcv(result, c, v)
+
+    def op_sub_reg_t1(self, m: int, n: int, d: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  SUB (register) T1 instruction...")
-            m = ((opcode >> 6) & 0x7)
-            n = ((opcode >> 3) & 0x7)
-            d = opcode & 0x7
             logger.debug(f"    Add R[{n}] to R[{m}]\tDestination: R[{d}] ...")
-            result, c, v = add_with_carry(self.registers[n], ~self.registers[m], True)
-            self.registers[d] = result
-            if d != 15:
-                self.apsr_n = bool(result & (1 << 31))
-                self.apsr_z = bool(result == 0)
-                self.apsr_c = c
-                self.apsr_v = v
-        # SUB (SP minus immediate)
-        elif (opcode >> 7) == 0b101100001:
+        registers = self.registers
+        result, c, v = subtract(registers[n], registers[m])
+        registers[d] = result
+        if d != 15:
+            self.set_nzcv(result, c, v)
+
+    def op_sub_sp_imm(self, imm32: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  SUB (SP minus immediate) instruction...")
-            imm32 = (opcode & 0x7F) << 2
             logger.debug(f"    Subtract {imm32:#x} from SP...")
-            result, c, v = add_with_carry(self.sp, ~imm32, True)
-            self.sp = result
-        # SXTB
-        elif (opcode >> 6) == 0b1011001001:
+        self.registers[13] -= imm32
+
+    def op_sxtb(self, d: int, m: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  SXTB instruction...")
-            d = opcode & 0x7
-            m = (opcode >> 3) & 0x7
-            self.registers[d] = sign_extend(self.registers[m] & 0xFF, 8) & 0xffffffff
-        # TST immediate (T1)
-        elif (opcode >> 6) == 0b0100001000:
+        self.registers[d] = sign_extend_byte(self.registers[m] & 0xFF)
+
+    def op_tst(self, n: int, m: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  TST instruction...")
-            n = opcode & 0x7
-            m = (opcode >> 3) & 0x7
-            result = self.registers[n] & self.registers[m]
-            self.apsr_n = bool(result & (1 << 31))
-            self.apsr_z = bool(result == 0)
-        # UXTB
-        elif (opcode >> 6) == 0b1011001011:
+        result = self.registers[n] & self.registers[m]
+        self.set_nz(result)
+
+    def op_uxtb(self, d: int, m: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  UXTB instruction...")
-            d = opcode & 0x7
-            m = (opcode >> 3) & 0x7
-            self.registers[d] = self.registers[m] & 0xFF
-        # UXTH
-        elif (opcode >> 6) == 0b1011001010:
+        self.registers[d] = self.registers[m] & 0xFF
+
+    def op_uxth(self, d: int, m: int) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("  UXTH instruction...")
-            d = opcode & 0x7
-            m = (opcode >> 3) & 0x7
-            self.registers[d] = self.registers[m] & 0xFFFF
-        # WFE
-        elif opcode == 0b1011111100100000:
+        self.registers[d] = self.registers[m] & 0xFFFF
+
+    def op_wfe(self) -> None:
+        if __debug__ and DEBUG_INSTRUCTIONS:
             logger.debug("    WFE")
-            pass
-        else:
-            logger.warning(" Instruction not implemented!!!!")
-            # raise NotImplementedError
-            self.on_break(42)
+
+    def op_undefined(self) -> None:
+        logger.warning(" Instruction not implemented!!!!")
+        # raise NotImplementedError
+        self.on_break(42)
+
+    def run(self, n_instructions: int) -> int:
+        '''
+        Execute up to n_instructions, returns the number of instructions executed before stopping.
+        '''
+        # Look up everything the loop needs once per batch instead of once per instruction
+        registers = self.registers
+        decode_cache_get = self.decode_cache.get
+        fetch_instruction = self.fetch_instruction
+        executed = 0
+        while executed < n_instructions and not self.stopped:
+            if __debug__ and DEBUG_REGISTERS:
+                self.execute_instruction()
+            else:
+                pc = registers[15]
+                instruction = decode_cache_get(pc)
+                if instruction is None:
+                    instruction = fetch_instruction(pc)
+                self.pc_previous = pc
+                registers[15] = pc + instruction[2]
+                instruction[0](self, *instruction[1])
+            executed += 1
+        return executed
 
     def execute(self) -> None:
         self.stopped = False
         while not self.stopped:
-            self.execute_instruction()
+            self.run(EXECUTE_BATCH_SIZE)
 
     def stop(self) -> None:
         self.stopped = True
@@ -917,3 +971,244 @@ class Rp2040:
         self.stop()
         self.stop_reason = reason
         logger.warning(f"Execution stopped! Reason: {reason}")
+
+
+def register_indices(register_list: int) -> tuple[int, ...]:
+    return tuple(i for i in range(8) if (register_list >> i) & 1)
+
+
+def decode_instruction(opcode: int, opcode2: int = 0) -> tuple[Callable[..., None], tuple[Any, ...]]:
+    '''
+    Decode an opcode into the Rp2040 method that executes it and the operands to call it with.
+    '''
+    # Extract the top bits of the opcode once for the instruction matching below
+    top4 = opcode >> 12
+    top5 = opcode >> 11
+    top7 = opcode >> 9
+    top8 = opcode >> 8
+    top9 = opcode >> 7
+    top10 = opcode >> 6
+    top11 = opcode >> 5
+
+    # ADC
+    if top10 == 0b0100000101:
+        return Rp2040.op_adc, ((opcode >> 3) & 0x07, opcode & 0x7)
+    # ADD (immediate) T1
+    elif top7 == 0b0001110:
+        return Rp2040.op_add_imm_t1, ((opcode >> 6) & 0x7, (opcode >> 3) & 0x7, opcode & 0x7)
+    # ADD (immediate) T2
+    elif top5 == 0b00110:
+        return Rp2040.op_add_imm_t2, ((opcode >> 8) & 0x7, opcode & 0xFF)
+    # ADD (register) T1
+    elif top7 == 0b0001100:
+        return Rp2040.op_add_reg_t1, ((opcode >> 6) & 0x7, (opcode >> 3) & 0x7, opcode & 0x7)
+    # ADD (register) T2
+    elif top8 == 0b01000100:
+        return Rp2040.op_add_reg_t2, (((opcode >> 4) & 0x08) | (opcode & 0x7), (opcode >> 3) & 0xF)
+    # ADD (SP plus immediate) T1
+    elif top5 == 0b10101:
+        return Rp2040.op_add_sp_imm_t1, ((opcode >> 8) & 0x7, (opcode & 0xFF) << 2)
+    # ADD (SP plus immediate) T2
+    elif top9 == 0b101100000:
+        return Rp2040.op_add_sp_imm_t2, ((opcode & 0x7F) << 2,)
+    # ADR
+    elif top5 == 0b10100:
+        return Rp2040.op_adr, ((opcode >> 8) & 0x7, (opcode & 0xff) << 2)
+    # AND
+    elif top10 == 0b0100000000:
+        return Rp2040.op_and, ((opcode >> 3) & 0x7, opcode & 0x7)
+    # ASR (immediate)
+    elif top5 == 0b00010:
+        imm5 = (opcode >> 6) & 0x1F
+        return Rp2040.op_asr_imm, ((opcode >> 3) & 0x07, opcode & 0x07, imm5 if imm5 != 0 else 32)
+    # B T1
+    elif (top4 == 0b1101) and ((top7 & 0x7) != 0b111):
+        return Rp2040.op_b_t1, (COND_TABLE[(opcode >> 8) & 0xf], sign_extend((opcode & 0xff) << 1, 9))
+    # B T2
+    elif top5 == 0b11100:
+        return Rp2040.op_b_t2, (sign_extend((opcode & 0x7ff) << 1, 12),)
+    # BIC
+    elif top10 == 0b0100001110:
+        return Rp2040.op_bic, (opcode & 0x7, (opcode >> 3) & 0x7)
+    # BKPT
+    elif top8 == 0b10111110:
+        return Rp2040.op_bkpt, (opcode & 0xff,)
+    # BL
+    elif (top5 == 0b11110) and ((opcode2 >> 14) == 0b11):
+        s = (opcode >> 10) & 1
+        # I1 = NOT(J1 XOR S), I2 = NOT(J2 XOR S)
+        i1 = ~((opcode2 >> 13) ^ s) & 1
+        i2 = ~((opcode2 >> 11) ^ s) & 1
+        imm32 = (i1 << 23 | i2 << 22 | (opcode & 0x3ff) << 12 | (opcode2 & 0x7ff) << 1) - (s << 24)
+        return Rp2040.op_bl, (imm32,)
+    # BLX
+    elif top9 == 0b010001111:
+        return Rp2040.op_blx, ((opcode >> 3) & 0xf,)
+    # BX
+    elif top9 == 0b010001110:
+        return Rp2040.op_bx, ((opcode >> 3) & 0xf,)
+    # CMP (immediate)
+    elif top5 == 0b00101:
+        return Rp2040.op_cmp_imm, ((opcode >> 8) & 0x7, opcode & 0xFF)
+    # CMP (register) T1
+    elif top10 == 0b0100001010:
+        return Rp2040.op_cmp_reg_t1, ((opcode >> 3) & 0x7, opcode & 0x7)
+    # CMP (register) T2
+    elif top8 == 0b01000101:
+        return Rp2040.op_cmp_reg_t2, (((opcode >> 4) & 0x08) | (opcode & 0x7), (opcode >> 3) & 0xF)
+    # CPS
+    elif top11 == 0b10110110011:
+        return Rp2040.op_cps, ((opcode >> 4) & 0x1,)
+    # DMB
+    elif (opcode == 0b1111001110111111) and ((opcode2 >> 4) == 0b100011110101):
+        # assert (opcode2 & 0xf) == 0b1111  # Apparently other options are used by the compiler
+        return Rp2040.op_dmb, ()
+    # EOR
+    elif top10 == 0b0100000001:
+        return Rp2040.op_eor, ((opcode >> 3) & 0x7, opcode & 0x7)
+    # LDM
+    elif top5 == 0b11001:
+        n = (opcode >> 8) & 0x7
+        return Rp2040.op_ldm, (n, register_indices(opcode & 0xff), not ((opcode >> n) & 1))
+    # LDR (immediate)
+    elif top5 == 0b01101:
+        return Rp2040.op_ldr_imm_t1, ((opcode >> 3) & 0x7, opcode & 0x7, ((opcode >> 6) & 0x1F) << 2)
+    # LDR immediate (T2)
+    elif top5 == 0b10011:
+        return Rp2040.op_ldr_imm_t2, ((opcode >> 8) & 0x7, (opcode & 0xff) << 2)
+    # LDR (literal)
+    elif top5 == 0b01001:
+        return Rp2040.op_ldr_literal, ((opcode >> 8) & 0x7, (opcode & 0xFF) << 2)
+    # LDR (register)
+    elif top7 == 0b0101100:
+        return Rp2040.op_ldr_reg, ((opcode >> 6) & 0x7, (opcode >> 3) & 0x7, opcode & 0x7)
+    # LDRB (immediate)
+    elif top5 == 0b01111:
+        return Rp2040.op_ldrb_imm, ((opcode >> 6) & 0x1F, (opcode >> 3) & 0x7, opcode & 0x7)
+    # LDRB (register)
+    elif top7 == 0b0101110:
+        return Rp2040.op_ldrb_reg, ((opcode >> 6) & 0x7, (opcode >> 3) & 0x7, opcode & 0x7)
+    # LDRH (immediate)
+    elif top5 == 0b10001:
+        return Rp2040.op_ldrh_imm, (((opcode >> 6) & 0x1F) << 1, (opcode >> 3) & 0x7, opcode & 0x7)
+    # LDRSB (register)
+    elif top7 == 0b0101011:
+        return Rp2040.op_ldrsb_reg, ((opcode >> 6) & 0x7, (opcode >> 3) & 0x7, opcode & 0x7)
+    # LDRSH (register)
+    elif top7 == 0b0101111:
+        return Rp2040.op_ldrsh_reg, ((opcode >> 6) & 0x7, (opcode >> 3) & 0x7, opcode & 0x7)
+    # LSLS (immediate)
+    elif top5 == 0b00000:
+        return Rp2040.op_lsl_imm, ((opcode >> 3) & 0x07, opcode & 0x07, (opcode >> 6) & 0x1F)
+    # LSLS (register)
+    elif top10 == 0b0100000010:
+        return Rp2040.op_lsl_reg, ((opcode >> 3) & 0x7, opcode & 0x7)
+    # LSR (immediate)
+    elif top5 == 0b00001:
+        imm5 = (opcode >> 6) & 0x1F
+        return Rp2040.op_lsr_imm, ((opcode >> 3) & 0x07, opcode & 0x07, imm5 if imm5 != 0 else 32)
+    # LSR (register)
+    elif top10 == 0b0100000011:
+        return Rp2040.op_lsr_reg, ((opcode >> 3) & 0x07, opcode & 0x07)
+    # MOV (immediate)
+    elif top5 == 0b00100:
+        return Rp2040.op_mov_imm, ((opcode >> 8) & 0x07, opcode & 0xFF)
+    # MOV (register)
+    elif top8 == 0b01000110:
+        return Rp2040.op_mov_reg, (((opcode >> 4) & 0x08) | (opcode & 0x7), (opcode >> 3) & 0xF)
+    # MRS
+    elif (opcode == 0b1111001111101111) and ((opcode2 >> 12) == 0b1000):
+        return Rp2040.op_mrs, ((opcode2 >> 8) & 0xf, opcode2 & 0xff)
+    # MSR
+    elif (top11 == 0b11110011100) and ((opcode2 >> 14) == 0b10):
+        return Rp2040.op_msr, (opcode & 0xf, opcode2 & 0xff)
+    # MUL
+    elif top10 == 0b0100001101:
+        return Rp2040.op_mul, (opcode & 0x7, (opcode >> 3) & 0x7)
+    # MVN
+    elif top10 == 0b0100001111:
+        return Rp2040.op_mvn, ((opcode >> 3) & 0x7, opcode & 0x7)
+    # ORR
+    elif top10 == 0b0100001100:
+        return Rp2040.op_orr, ((opcode >> 3) & 0x7, opcode & 0x7)
+    # POP
+    elif top7 == 0b1011110:
+        # 'P'-bit -> pop PC register last
+        p = bool((opcode >> 8) & 0x1)
+        return Rp2040.op_pop, (register_indices(opcode & 0xff) + ((15,) if p else ()), p)
+    # PUSH
+    elif top7 == 0b1011010:
+        # 'M'-bit -> push LR register last
+        return Rp2040.op_push, (register_indices(opcode & 0xff) + ((14,) if opcode & (1 << 8) else ()),)
+    # REV
+    elif top10 == 0b1011101000:
+        return Rp2040.op_rev, ((opcode >> 3) & 0x7, opcode & 0x7)
+    # RSB / NEG
+    elif top10 == 0b0100001001:
+        return Rp2040.op_rsb, ((opcode >> 3) & 0x7, opcode & 0x7)
+    # SBC
+    elif top10 == 0b0100000110:
+        return Rp2040.op_sbc, ((opcode >> 3) & 0x7, opcode & 0x7)
+    # SEV
+    elif opcode == 0b1011111101000000:
+        return Rp2040.op_sev, ()
+    # STM
+    elif top5 == 0b11000:
+        return Rp2040.op_stm, ((opcode >> 8) & 0x7, register_indices(opcode & 0xff))
+    # STR immediate (T1)
+    elif top5 == 0b01100:
+        return Rp2040.op_str_imm_t1, ((opcode >> 3) & 0x7, opcode & 0x7, ((opcode >> 6) & 0x1F) << 2)
+    # STR immediate (T2)
+    elif top5 == 0b10010:
+        return Rp2040.op_str_imm_t2, ((opcode >> 8) & 0x7, (opcode & 0xff) << 2)
+    # STR register
+    elif top7 == 0b0101000:
+        return Rp2040.op_str_reg, ((opcode >> 6) & 0x7, (opcode >> 3) & 0x7, opcode & 0x7)
+    # STRB immediate
+    elif top5 == 0b01110:
+        return Rp2040.op_strb_imm, ((opcode >> 6) & 0x1f, (opcode >> 3) & 0x7, opcode & 0x7)
+    # STRB register
+    elif top7 == 0b0101010:
+        return Rp2040.op_strb_reg, ((opcode >> 6) & 0x7, (opcode >> 3) & 0x7, opcode & 0x7)
+    # STRH immediate
+    elif top5 == 0b10000:
+        return Rp2040.op_strh_imm, (((opcode >> 6) & 0x1f) << 1, (opcode >> 3) & 0x7, opcode & 0x7)
+    # STRH register
+    elif top7 == 0b0101001:
+        return Rp2040.op_strh_reg, ((opcode >> 6) & 0x7, (opcode >> 3) & 0x7, opcode & 0x7)
+    # SUB (immediate) T1
+    elif top7 == 0b0001111:
+        return Rp2040.op_sub_imm_t1, (opcode & 0x7, (opcode >> 3) & 0x7, (opcode >> 6) & 0x7)
+    # SUB (immediate) T2
+    elif top5 == 0b00111:
+        return Rp2040.op_sub_imm_t2, ((opcode >> 8) & 0x7, opcode & 0xFF)
+    # SUB (register) T1
+    elif top7 == 0b0001101:
+        return Rp2040.op_sub_reg_t1, ((opcode >> 6) & 0x7, (opcode >> 3) & 0x7, opcode & 0x7)
+    # SUB (SP minus immediate)
+    elif top9 == 0b101100001:
+        return Rp2040.op_sub_sp_imm, ((opcode & 0x7F) << 2,)
+    # SXTB
+    elif top10 == 0b1011001001:
+        return Rp2040.op_sxtb, (opcode & 0x7, (opcode >> 3) & 0x7)
+    # TST immediate (T1)
+    elif top10 == 0b0100001000:
+        return Rp2040.op_tst, (opcode & 0x7, (opcode >> 3) & 0x7)
+    # UXTB
+    elif top10 == 0b1011001011:
+        return Rp2040.op_uxtb, (opcode & 0x7, (opcode >> 3) & 0x7)
+    # UXTH
+    elif top10 == 0b1011001010:
+        return Rp2040.op_uxth, (opcode & 0x7, (opcode >> 3) & 0x7)
+    # WFE
+    elif opcode == 0b1011111100100000:
+        return Rp2040.op_wfe, ()
+    else:
+        return Rp2040.op_undefined, ()
+
+
+# Decoded handler and operands for every 16-bit opcode, 32-bit instructions are decoded on fetch
+DECODE_TABLE: list[tuple[Callable[..., None], tuple[Any, ...]]] = [
+    decode_instruction(opcode) if (opcode >> 12) != 0b1111 else (Rp2040.op_undefined, ())
+    for opcode in range(0x10000)
+]
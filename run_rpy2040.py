@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 import logging
-from rpy2040.rpy2040 import Rp2040, loadbin
+import rpy2040.rpy2040
+from rpy2040.rpy2040 import Rp2040, FLASH_START, loadbin
 from util.uf2 import loaduf2
 
 LOGGING_LEVEL = logging.ERROR
@@ -12,8 +13,6 @@ def main():  # pragma: no cover
     import argparse
     from functools import partial
 
-    logging.basicConfig(level=LOGGING_LEVEL)
-
     parser = argparse.ArgumentParser(description='RPy2040 - an RP2040 emulator written in Python')
 
     base16 = partial(int, base=16)
@@ -28,15 +27,27 @@ def main():  # pragma: no cover
                         help='Limit the number of instructions to execute')
     parser.add_argument('-s', '--step', action='store_true',
                         help='Enable stepping per instruction')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='Trace the registers and every executed instruction')
 
     args = parser.parse_args()
 
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG)
+        rpy2040.rpy2040.DEBUG_REGISTERS = True
+        rpy2040.rpy2040.DEBUG_INSTRUCTIONS = True
+    else:
+        logging.basicConfig(level=LOGGING_LEVEL)
+
     rp = Rp2040()
     filename = str(args.filename)
     if filename.endswith('.bin'):
-        loadbin(filename, rp.flash)
+        image_size = loadbin(filename, rp.flash)
     elif filename.endswith('.uf2'):
-        loaduf2(filename, rp.flash, offset=0x10000000)
+        image_size = loaduf2(filename, rp.flash, offset=FLASH_START)
+    else:
+        image_size = 0
+    rp.predecode(FLASH_START, image_size)
 
     if args.bootrom:
         loadbin(args.bootrom, rp.rom)
@@ -45,11 +56,12 @@ def main():  # pragma: no cover
     if args.entry_point:
         rp.pc = args.entry_point
 
-    if args.icount:
+    if args.icount and not args.step:
+        rp.run(args.icount)
+    elif args.icount:
         for _ in range(args.icount):
             rp.execute_instruction()
-            if args.step:
-                input("* Press Enter to execute next instruction...")
+            input("* Press Enter to execute next instruction...")
     elif args.step:
         while True:
             rp.execute_instruction()
@@ -0,0 +1,25 @@
+from rpy2040.peripherals.memory import ByteArrayMemory, LittleEndianWords
+
+
+class TestByteArrayMemory:
+
+    def test_aligned_word_access(self):
+        mem = ByteArrayMemory(0x20000000, 0x100)
+        mem.write(0x8, 0x1cafef00d)
+        assert mem.memory[0x8:0xc] == b'\x0d\xf0\xfe\xca'
+        assert mem.read(0x8) == 0xcafef00d
+        assert mem.words[2] == 0xcafef00d
+
+    def test_unaligned_word_access(self):
+        mem = ByteArrayMemory(0x20000000, 0x100)
+        mem.write(0x9, 0xcafef00d)
+        assert mem.memory[0x9:0xd] == b'\x0d\xf0\xfe\xca'
+        assert mem.read(0x9) == 0xcafef00d
+        assert mem.read(0xa, num_bytes=2) == 0xfef0
+
+    def test_little_endian_words(self):
+        memory = bytearray(8)
+        words = LittleEndianWords(memory)
+        words[1] = 0xcafef00d
+        assert memory[4:8] == b'\x0d\xf0\xfe\xca'
+        assert words[1] == 0xcafef00d
@@ -0,0 +1,97 @@
+import logging
+from rpy2040.peripherals.mpu import Mpu
+from rpy2040.peripherals.memory import ByteArrayMemory
+from rpy2040.peripherals.resets import Resets
+from rpy2040.peripherals.xosc import Xosc
+from rpy2040.peripherals.clocks import Clocks
+from rpy2040.peripherals.uart import Uart
+
+
+class TestMpu:
+
+    def test_find_region(self):
+        mpu = Mpu()
+        sram = ByteArrayMemory(0x20000000, 0x1000)
+        resets = Resets()
+        xosc = Xosc()
+        mpu.register_region("sram", sram)
+        mpu.register_region("resets", resets)
+        mpu.register_region("xosc", xosc)
+        assert mpu.find_region(0x20000000) is sram
+        assert mpu.find_region(0x20000fff) is sram
+        assert mpu.find_region(0x4000c008) is resets
+        assert mpu.find_region(0x40024004) is xosc
+
+    def test_find_region_page_table(self):
+        mpu = Mpu()
+        flash = ByteArrayMemory(0x10000000, 0x1000000)
+        sram = ByteArrayMemory(0x20000000, 0x42000)
+        xosc = Xosc()
+        mpu.register_region("flash", flash)
+        mpu.register_region("sram", sram)
+        mpu.register_region("xosc", xosc)
+        assert mpu.page_table[0x10fff] is flash
+        assert mpu.page_table[0x20041] is sram
+        assert 0x20042 not in mpu.page_table
+        assert 0x40024 not in mpu.page_table
+        assert mpu.find_region(0x10ffffff) is flash
+        assert mpu.find_region(0x20041fff) is sram
+        assert mpu.find_region(0x40024004) is xosc
+
+    def test_find_region_unmapped(self):
+        mpu = Mpu()
+        mpu.register_region("sram", ByteArrayMemory(0x20000000, 0x1000))
+        assert mpu.find_region(0x10000000) is None
+        assert mpu.find_region(0x20001000) is None
+        assert mpu.read(0x20001000) == 0
+
+    def test_find_region_between_small_regions(self):
+        mpu = Mpu()
+        resets = Resets()
+        xosc = Xosc()
+        mpu.register_region("resets", resets)
+        mpu.register_region("xosc", xosc)
+        assert mpu.find_region(0x4000c000) is resets
+        assert mpu.find_region(0x40024000) is xosc
+        assert mpu.find_region(0x40010000) is None
+        assert mpu.find_region(0x4000c004) is resets
+
+    def test_unhandled_register_read(self):
+        xosc = Xosc()
+        assert xosc.read(0x0) == 0
+        assert xosc.read(0x4) == 0x80000000
+        assert xosc.read(0x7, num_bytes=1) == 0x80
+
+    def test_unhandled_register_write(self, caplog):
+        uart = Uart()
+        with caplog.at_level(logging.INFO, logger="rpy2040"):
+            uart.write(0x30, 0x301)
+        assert uart.read(0x30) == 1
+        assert "Write of value [769/0x301] to UART address [0x40034030]" in caplog.text
+
+    def test_atomic_write(self):
+        clocks = Clocks()
+        clocks.write(0x30, 0x2)
+        clocks.write(0x2030, 0x1)
+        assert clocks.read(0x30) == 0x3
+        clocks.write(0x3030, 0x2)
+        assert clocks.read(0x30) == 0x1
+
+    def test_narrow_writes(self):
+        mpu = Mpu()
+        sram = ByteArrayMemory(0x20000000, 0x1000)
+        mpu.register_region("sram", sram)
+        mpu.write_uint8(0x20000001, 0x1cafe)
+        mpu.write_uint16(0x20000002, 0x1f00d)
+        assert sram.memory[0:4] == b'\x00\xfe\x0d\xf0'
+
+    def test_odd_width_writes(self):
+        mpu = Mpu()
+        sram = ByteArrayMemory(0x20000000, 0x1000)
+        mpu.register_region("sram", sram)
+        mpu.write(0x20000001, 0x112233, 3)
+        mpu.write(0x20000008, 0x1122334455667788, 8)
+        assert sram.memory[0:4] == b'\x00\x33\x22\x11'
+        assert sram.memory[8:16] == b'\x88\x77\x66\x55\x44\x33\x22\x11'
+        assert mpu.read(0x20000001, 3) == 0x112233
+        assert mpu.read(0x20000008, 8) == 0x1122334455667788
@@ -1,4 +1,6 @@
-from rpy2040.rpy2040 import Rp2040, SRAM_START, add_with_carry
+import pytest
+import rpy2040.rpy2040
+from rpy2040.rpy2040 import Rp2040, FLASH_START, FLASH_END, SRAM_START, add_with_carry, loadbin, subtract
 import util.assembler as asm
 
 SP_START = 0x20000100
@@ -92,6 +94,15 @@ class TestInstructions:
         rp.execute_instruction()
         assert rp.registers[3] == 0x42 + 0x69
 
+    def test_add_register_t2_wraps(self):
+        rp = Rp2040()
+        opcode = asm.opcodeADDregT2(rdn=asm.R3, rm=asm.R12)  # add	r3, ip
+        rp.flash[0:2] = opcode
+        rp.registers[3] = 0xfffffff0
+        rp.registers[12] = 0x20
+        rp.execute_instruction()
+        assert rp.registers[3] == 0x10
+
     def test_add_sp_immediate_t1(self):
         rp = Rp2040()
         opcode = asm.opcodeADDSPimmT1(rd=asm.R6, imm8=3)  # add r6, sp, #12
@@ -167,6 +178,15 @@ class TestInstructions:
         assert rp.apsr_z is False
         assert rp.apsr_c is True
 
+    def test_asr_immediate_same_register(self):
+        rp = Rp2040()
+        rp.registers[4] = 0x00000074
+        opcode = asm.opcodeASRimm(rd=4, rm=4, imm5=3)  # asrs r4, r4, #3
+        rp.flash[0:len(opcode)] = opcode
+        rp.execute_instruction()
+        assert rp.registers[4] == 0x0000000e
+        assert rp.apsr_c is True
+
     def test_b_t2(self):
         rp = Rp2040()
         rp.pc = 0x10000376
@@ -220,6 +240,15 @@ class TestInstructions:
         assert rp.pc == 0x10000378
         assert rp.lr == 0x10000365
 
+    def test_bl_negative(self):
+        rp = Rp2040()
+        rp.pc = 0x10000360
+        opcode = asm.opcodeBL(imm32=-20)  # bl	10000350
+        rp.flash[0x360:0x364] = opcode
+        rp.execute_instruction()
+        assert rp.pc == 0x10000350
+        assert rp.lr == 0x10000365
+
     def test_blx(self):
         rp = Rp2040()
         rp.pc = 0x10000376
@@ -239,6 +268,26 @@ class TestInstructions:
         rp.execute_instruction()
         assert rp.pc == 0x10000374
 
+    def test_bgt_not_taken(self):
+        rp = Rp2040()
+        rp.pc = 0x10000378
+        opcode = asm.opcodeBT1(cond=asm.GT, imm8=-4)  # bgt.n	10000374
+        rp.flash[0x378:0x37a] = opcode
+        rp.apsr_n = True
+        rp.apsr_v = False
+        rp.execute_instruction()
+        assert rp.pc == 0x1000037a
+
+    def test_bhi_taken(self):
+        rp = Rp2040()
+        rp.pc = 0x10000378
+        opcode = asm.opcodeBT1(cond=asm.HI, imm8=-4)  # bhi.n	10000374
+        rp.flash[0x378:0x37a] = opcode
+        rp.apsr_c = True
+        rp.apsr_z = False
+        rp.execute_instruction()
+        assert rp.pc == 0x10000374
+
     def test_bx(self):
         rp = Rp2040()
         rp.pc = 0x10000376
@@ -363,6 +412,15 @@ class TestInstructions:
         rp.execute_instruction()
         assert rp.registers[3] == 0xcafebabe
 
+    def test_ldr_immediate_t1_flash(self):
+        rp = Rp2040()
+        opcode = asm.opcodeLDRimmT1(rt=asm.R3, rn=asm.R2, imm5=1)  # ldr r3, [r2, #4]
+        rp.flash[0:2] = opcode
+        rp.flash[0x104:0x108] = b'\x0d\xf0\xfe\xca'
+        rp.registers[2] = FLASH_START + 0x100
+        rp.execute_instruction()
+        assert rp.registers[3] == 0xcafef00d
+
     def test_ldr_immediate_t2(self):
         rp = Rp2040()
         opcode = asm.opcodeLDRimmT2(rt=3, imm8=6)  # ldr r3, [sp, #24]
@@ -376,7 +434,7 @@ class TestInstructions:
         rp = Rp2040()
         opcode = asm.opcodeLDRlit(rt=asm.R2, imm8=9)  # ldr	r2, [pc, #36]
         rp.flash[0:2] = opcode
-        rp.flash[40:44] = (0x4001c004).to_bytes(4, 'little')
+        rp.flash_words[40 >> 2] = 0x4001c004
         rp.execute_instruction()
         assert rp.registers[2] == 0x4001c004
 
@@ -486,6 +544,21 @@ class TestInstructions:
         assert rp.apsr_z is False
         assert rp.apsr_c is True
 
+    def test_lsr_register_zero_shift(self):
+        rp = Rp2040()
+        opcode = asm.opcodeLSRreg(rdn=1, rm=4)   # lsrs r1, r4
+        rp.flash[0:len(opcode)] = opcode
+        rp.registers[1] = 0x80000000
+        rp.registers[4] = 0x00000000
+        rp.apsr_c = True
+        rp.apsr_v = True
+        rp.execute_instruction()
+        assert rp.registers[1] == 0x80000000
+        assert rp.apsr_n is True
+        assert rp.apsr_z is False
+        assert rp.apsr_c is True
+        assert rp.apsr_v is True
+
     def test_mov_immediate(self):
         rp = Rp2040()
         rp.flash[0:2] = b'\xd0\x24'  # movs	r4, #208
@@ -753,44 +826,21 @@ class TestInstructions:
         rp.execute_instruction()
         assert rp.registers[1] == 0xffffff84
 
-    def test_tst(self):
+    @pytest.mark.parametrize("r1, r3, flags_in, n, z, c", [
+        (0x42, 0x43, (True, True, True), False, False, True),
+        (0xf0000000, 0xf0000400, (False, True, False), True, False, False),
+        (0xf0000000, 0x0000f000, (False, False, False), False, True, False),
+    ], ids=["nonzero", "negative", "zero"])
+    def test_tst(self, r1, r3, flags_in, n, z, c):
         rp = Rp2040()
         rp.flash[0:2] = b'\x19\x42'  # tst r1, r3
-        rp.registers[1] = 0x42
-        rp.registers[3] = 0x43
-        rp.apsr_n = True
-        rp.apsr_z = True
-        rp.apsr_c = True
+        rp.registers[1] = r1
+        rp.registers[3] = r3
+        rp.apsr_n, rp.apsr_z, rp.apsr_c = flags_in
         rp.execute_instruction()
-        assert rp.apsr_n is False
-        assert rp.apsr_z is False
-        assert rp.apsr_c is True
-
-    def test_tst_negative(self):
-        rp = Rp2040()
-        rp.flash[0:2] = b'\x19\x42'  # tst	r1, r3
-        rp.registers[1] = 0xf0000000
-        rp.registers[3] = 0xf0000400
-        rp.apsr_n = False
-        rp.apsr_z = True
-        rp.apsr_c = False
-        rp.execute_instruction()
-        assert rp.apsr_n is True
-        assert rp.apsr_z is False
-        assert rp.apsr_c is False
-
-    def test_tst_zero(self):
-        rp = Rp2040()
-        rp.flash[0:2] = b'\x19\x42'  # tst	r1, r3
-        rp.registers[1] = 0xf0000000
-        rp.registers[3] = 0x0000f000
-        rp.apsr_n = False
-        rp.apsr_z = False
-        rp.apsr_c = False
-        rp.execute_instruction()
-        assert rp.apsr_n is False
-        assert rp.apsr_z is True
-        assert rp.apsr_c is False
+        assert rp.apsr_n is n
+        assert rp.apsr_z is z
+        assert rp.apsr_c is c
 
     def test_uxtb(self):
         rp = Rp2040()
@@ -809,34 +859,120 @@ class TestInstructions:
         assert rp.registers[1] == 0x00000304
 
 
+class TestRun:
+
+    def load_count_loop(self, rp):
+        program = (asm.opcodeADDimmT2(rdn=asm.R0, imm8=1)  # adds r0, #1
+                   + asm.opcodeCMPimm(rn=asm.R0, imm8=10)  # cmp r0, #10
+                   + asm.opcodeBT1(cond=asm.NE, imm8=-4)  # bne.n 10000000
+                   + asm.opcodeBKPT(imm8=0x27))  # bkpt 0x0027
+        rp.flash[0:len(program)] = program
+
+    def test_run_until_break(self):
+        rp = Rp2040()
+        self.load_count_loop(rp)
+        assert rp.run(1000) == 31
+        assert rp.registers[0] == 10
+        assert rp.stopped is True
+        assert rp.stop_reason == 0x27
+
+    def test_run_limit(self):
+        rp = Rp2040()
+        self.load_count_loop(rp)
+        assert rp.run(5) == 5
+        assert rp.registers[0] == 2
+        assert rp.pc == 0x10000004
+        assert rp.stopped is False
+
+
+class TestDecodeCache:
+
+    def test_flash_write_invalidates(self):
+        rp = Rp2040()
+        rp.flash[0:2] = asm.opcodeADDimmT2(rdn=asm.R1, imm8=1)  # adds r1, #1
+        rp.execute_instruction()
+        assert rp.registers[1] == 1
+        rp.mpu.write(FLASH_START, int.from_bytes(asm.opcodeADDimmT2(rdn=asm.R1, imm8=5), 'little'), num_bytes=2)
+        rp.pc = FLASH_START
+        rp.execute_instruction()
+        assert rp.registers[1] == 6
+
+    def test_predecode(self):
+        rp = Rp2040()
+        rp.flash[0:2] = asm.opcodeADDimmT2(rdn=asm.R1, imm8=1)  # adds r1, #1
+        rp.flash[2:6] = asm.opcodeBL(0x100)
+        rp.predecode(FLASH_START, 6)
+        assert sorted(rp.decode_cache) == [FLASH_START, FLASH_START + 2, FLASH_START + 4]
+        assert rp.decode_cache[FLASH_START + 2][0] is Rp2040.op_bl
+        rp.execute_instruction()
+        assert rp.registers[1] == 1
+
+    def test_fetch_bl(self):
+        rp = Rp2040()
+        rp.flash[0:4] = asm.opcodeBL(0x100)
+        handler, _, size = rp.fetch_instruction(FLASH_START)
+        assert handler is Rp2040.op_bl
+        assert size == 4
+
+    def test_fetch_last_flash_halfword(self):
+        rp = Rp2040()
+        rp.flash[-2:] = asm.opcodeADDimmT2(rdn=asm.R1, imm8=1)  # adds r1, #1
+        rp.pc = FLASH_END - 2
+        rp.execute_instruction()
+        assert rp.registers[1] == 1
+
+
+class TestDebugLogging:
+
+    @pytest.mark.skipif(not __debug__, reason="tracing is compiled out with python -O")
+    def test_trace_instructions(self, monkeypatch, caplog):
+        monkeypatch.setattr(rpy2040.rpy2040, "DEBUG_REGISTERS", True)
+        monkeypatch.setattr(rpy2040.rpy2040, "DEBUG_INSTRUCTIONS", True)
+        caplog.set_level("DEBUG", logger="rpy2040")
+        rp = Rp2040()
+        rp.flash[0:2] = asm.opcodeADDimmT2(rdn=asm.R1, imm8=1)  # adds r1, #1
+        rp.execute_instruction()
+        assert rp.registers[1] == 1
+        assert "  ADD (immediate) T2 instruction..." in caplog.messages
+        assert any(message.startswith("PC: 0x10000000") for message in caplog.messages)
+
+
 class TestAddWithCarry:
 
-    def test_subtract_no_flags(self):
-        result, c, v = add_with_carry(0x00b71b00, ~0xb71b0000, True)
-        assert result == 1234967296
-        assert c is False
-        assert v is False
-
-    def test_add_no_flags(self):
-        result, c, v = add_with_carry(200, 400, False)
-        assert result == 600
-        assert c is False
-        assert v is False
-
-    def test_add_carry_out(self):
-        result, c, v = add_with_carry(0xFFFFFFFFFF, 1, False)
-        assert result == 0
-        assert c is True
-        assert v is False
-
-    def test_subtract_carry_out(self):
-        result, c, v = add_with_carry(0xFFFFFFFFFF, ~0x00000008, True)
-        assert result == 4294967287
-        assert c is True
-        assert v is False
-
-    def test_subtract_overflow(self):
-        result, c, v = add_with_carry(0, ~0x80000000, True)
-        assert result == 2147483648
-        assert c is False
-        assert v is True
+    @pytest.mark.parametrize("x, y, carry_in, expected_result, expected_c, expected_v", [
+        (0x00b71b00, ~0xb71b0000, True, 1234967296, False, False),
+        (200, 400, False, 600, False, False),
+        (0xFFFFFFFFFF, 1, False, 0, True, False),
+        (0xFFFFFFFFFF, ~0x00000008, True, 4294967287, True, False),
+        (0, ~0x80000000, True, 2147483648, False, True),
+    ], ids=["subtract_no_flags", "add_no_flags", "add_carry_out", "subtract_carry_out", "subtract_overflow"])
+    def test_add_with_carry(self, x, y, carry_in, expected_result, expected_c, expected_v):
+        result, c, v = add_with_carry(x, y, carry_in)
+        assert result == expected_result
+        assert c is expected_c
+        assert v is expected_v
+
+
+class TestSubtract:
+
+    @pytest.mark.parametrize("x", [0, 1, 8, 0x7fffffff, 0x80000000, 0xffffffff])
+    @pytest.mark.parametrize("y", [0, 1, 8, 0x7fffffff, 0x80000000, 0xffffffff])
+    def test_matches_add_with_carry(self, x, y):
+        assert subtract(x, y) == add_with_carry(x, ~y, True)
+
+
+class TestLoadbin:
+
+    def test_loadbin(self, tmp_path):
+        filename = tmp_path / "firmware.bin"
+        filename.write_bytes(b'\x01\x31\xfe\xe7')
+        rp = Rp2040()
+        assert loadbin(str(filename), rp.flash, 4) == 4
+        assert rp.flash[0:8] == b'\xff\xff\xff\xff\x01\x31\xfe\xe7'
+
+    def test_loadbin_larger_than_memory(self, tmp_path):
+        filename = tmp_path / "bootrom.bin"
+        filename.write_bytes(b'\xaa' * 8)
+        mem = bytearray(4)
+        assert loadbin(str(filename), mem) == 4
+        assert mem == b'\xaa' * 4
@@ -0,0 +1,16 @@
+from rpy2040.peripherals.sio import Sio, SIO_GPIO_OUT_SET, SIO_GPIO_OUT_CLR, get_pinlist
+
+
+class TestSio:
+
+    def test_pinlist(self):
+        assert list(get_pinlist(0)) == []
+        assert list(get_pinlist(1 << 25)) == [25]
+        assert list(get_pinlist(0x80000005)) == [0, 2, 31]
+
+    def test_gpio_set_clr(self, capsys):
+        sio = Sio()
+        sio.write(SIO_GPIO_OUT_SET, 1 << 25)
+        sio.write(SIO_GPIO_OUT_CLR, 0x3)
+        assert capsys.readouterr().out == (">> GPIO pins set to HIGH/set: [25]\n"
+                                           ">> GPIO pins set to LOW/cleared: [0, 1]\n")
@@ -15,7 +15,9 @@ MD5_CHECKSUM_PRESENT = 0x00004000
 EXTENSION_TAGS_PRESENT = 0x00008000
 
 
-def loaduf2(filename: str, mem: bytearray, offset: int = 0) -> None:
+def loaduf2(filename: str, mem: bytearray, offset: int = 0) -> int:
+    # Returns the end of the loaded image relative to offset
+    end = 0
     with open(filename, 'rb') as fp:
         while True:
             # Read 512-byte block
@@ -40,7 +42,9 @@ def loaduf2(filename: str, mem: bytearray, offset: int = 0) -> None:
                 continue
             addr = targetaddr - offset
             mem[addr:addr + payloadsize] = block[32:32 + payloadsize]
+            end = max(end, addr + payloadsize)
             logger.debug(f"{flags=:x}\t{targetaddr=:x}\t{payloadsize=}\t{blockno=}\t{numblocks=}\t{filesize=:x}")
+    return end
 
 
 if __name__ == "__main__":